@@ -1,42 +1,347 @@
-from django.contrib import admin
-from .models import Item, CheckoutSession, Order, OrderPayment, Discount, Tax
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.html import format_html, format_html_join
+from .models import Item, CheckoutSession, Order, OrderItem, OrderPayment, Discount, Tax, RequestProfile, ArchivedSession, DailyRevenue
+from .services import counts, profiling, stripe_sync
+
+# сколько ошибок по строкам показывать после массового действия
+MAX_ROW_ERRORS = 20
+
+# итог массовой Stripe-операции: общая сводка + сообщение на каждую упавшую строку
+def _report_results(modeladmin, request, title, results):
+    failed = [(obj, err) for obj, err in results if err is not None]
+    ok = len(results) - len(failed)
+    paid = sum(1 for obj, err in results if err is None and getattr(obj, "paid", False))
+    summary = f"{title}: успешно {ok}, ошибок {len(failed)}"
+    if any(hasattr(obj, "paid") for obj, _ in results):
+        summary += f", PAID {paid}"
+    level = messages.SUCCESS if not failed else (messages.WARNING if ok else messages.ERROR)
+    modeladmin.message_user(request, summary, level)
+
+    for obj, err in failed[:MAX_ROW_ERRORS]:
+        msg = getattr(err, "user_message", None) or str(err)
+        modeladmin.message_user(request, f"{obj}: {msg}", messages.ERROR)
+    if len(failed) > MAX_ROW_ERRORS:
+        modeladmin.message_user(request, f"... и ещё {len(failed) - MAX_ROW_ERRORS} ошибок", messages.ERROR)
+
+def push_to_stripe(modeladmin, request, queryset):
+    _report_results(modeladmin, request, "Push to Stripe", stripe_sync.push_to_stripe(queryset))
+push_to_stripe.short_description = "Push selected to Stripe"
+
+# COUNT(*) по большой таблице заменяется оценкой (services.counts.estimated_count)
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def estimate(self) -> tuple:
+        return counts.estimated_count(self.object_list)
+
+    @cached_property
+    def count(self) -> int:
+        return self.estimate[0]
+
+# keyset-пагинация changelist по (created_at, id) вместо OFFSET: ?cursor=<created_at>,<id> последней строки
+# предыдущей страницы; работает, пока сортировка начинается с created_at и id (в любую сторону),
+# для остальных сортировок остаётся обычный постраничный вывод
+CURSOR_VAR = "cursor"
+
+class KeysetChangeList(ChangeList):
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = self._parse_cursor(request.GET.get(CURSOR_VAR))
+        super().__init__(request, *args, **kwargs)
+
+    @staticmethod
+    def _parse_cursor(value):
+        if not value:
+            return None
+        created_at, _, pk = value.rpartition(",")
+        created_at = parse_datetime(created_at)
+        if created_at is None or not pk.isdigit():
+            raise IncorrectLookupParameters(f"Некорректный {CURSOR_VAR}: {value}")
+        return created_at, int(pk)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    # ссылки фильтров, поиска и сортировки начинают с первой страницы
+    def get_query_string(self, new_params=None, remove=None):
+        return super().get_query_string(new_params, [*(remove or ()), CURSOR_VAR])
+
+    # направления (created_at, id), если сортировка начинается с них; admin дописывает ordering
+    # модели в хвост, поэтому повторы полей отбрасываются
+    def _keyset_order(self):
+        seen = {}
+        for field in self.queryset.query.order_by:
+            if not isinstance(field, str):
+                return None
+            name = field.lstrip("-")
+            seen.setdefault("id" if name == "pk" else name, field.startswith("-"))
+        if list(seen)[:2] != ["created_at", "id"]:
+            return None
+        return seen["created_at"], seen["id"]
+
+    def get_results(self, request):
+        order = self._keyset_order()
+        if order is None or self.list_editable:
+            self.keyset = False
+            return super().get_results(request)
+
+        qs = self.queryset
+        if self.cursor is not None:
+            created_at, pk = self.cursor
+            created_desc, id_desc = order
+            # диапазон по created_at идёт по индексу, строки с тем же created_at отсекаются по id
+            qs = qs.filter(
+                Q(**{f"created_at__{'lte' if created_desc else 'gte'}": created_at})
+                & ~Q(**{"created_at": created_at, f"id__{'gte' if id_desc else 'lte'}": pk})
+            )
+        rows = list(qs[:self.list_per_page + 1])
+        result_list = rows[:self.list_per_page]
+        self.next_cursor = None
+        if len(rows) > self.list_per_page:
+            last = result_list[-1]
+            self.next_cursor = f"{last.created_at.isoformat()},{last.pk}"
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.keyset = True
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = self.cursor is not None or self.next_cursor is not None
+        self.paginator = paginator
+
+    @property
+    def count_label(self) -> str:
+        count, kind = getattr(self.paginator, "estimate", (self.result_count, counts.EXACT))
+        if kind == counts.ESTIMATE:
+            return f"≈ {count:,}".replace(",", " ")
+        if kind == counts.AT_LEAST:
+            return f"более {count:,}".replace(",", " ")
+        return str(count)
+
+    def first_page_url(self) -> str:
+        return self.get_query_string()
+
+    def next_page_url(self) -> str:
+        return self.get_query_string({CURSOR_VAR: self.next_cursor}) if self.next_cursor else ""
+
+# changelist таблиц сессий оплаты (десятки миллионов строк): оценка числа строк вместо COUNT(*),
+# keyset-пагинация, сортировка только по индексированному created_at, поиск только точный по session_id
+# (search_fields = session_id__exact: iexact/LIKE индекс не использует)
+class LargeTableAdmin(admin.ModelAdmin):
+    ordering = ("-created_at", "-id")
+    sortable_by = ("created_at",)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    change_list_template = "admin/catalog/keyset_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+# фильтр CheckoutSession по валюте товара: EXISTS по PK товара вместо JOIN с условием на Item.currency —
+# иначе SQLite ведёт запрос от индекса валюты и сортирует все сессии этой валюты ради одной страницы
+class ItemCurrencyFilter(admin.SimpleListFilter):
+    title = "currency"
+    parameter_name = "item__currency"
+
+    def lookups(self, request, model_admin):
+        currencies = Item.objects.order_by("currency").values_list("currency", flat=True).distinct()
+        return [(c, c.upper()) for c in currencies]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(Exists(Item.objects.filter(pk=OuterRef("item_id"), currency=self.value())))
+        return queryset
 
 @admin.register(Item)
 class ItemAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "display_price", "currency")
+    list_display = ("id", "name", "display_price", "currency", "stripe_product_id")
     list_filter = ("currency",)
     search_fields = ("name",)
+    actions = (push_to_stripe,)
 
 @admin.register(CheckoutSession)
-class CheckoutSessionAdmin(admin.ModelAdmin):
+class CheckoutSessionAdmin(LargeTableAdmin):
     list_display = ("session_id", "item", "paid", "created_at")
-    list_filter = ("paid", "item__currency")
-    search_fields = ("session_id", "item__name")
+    list_filter = ("paid", ItemCurrencyFilter)
+    search_fields = ("session_id__exact",)
+    actions = ("refresh_status",)
+
+    def refresh_status(self, request, queryset):
+        _report_results(self, request, "Refresh from Stripe", stripe_sync.refresh_checkout_sessions(queryset))
+    refresh_status.short_description = "Refresh payment status from Stripe"
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    autocomplete_fields = ("item",)
+    extra = 1
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ("id", "paid", "currency", "created_at", "total_amount_display", "discount")
     list_filter = ("paid", "currency", "discount")
-    filter_horizontal = ("items", "taxes")
+    filter_horizontal = ("taxes",)
+    inlines = (OrderItemInline,)
 
     def total_amount_display(self, obj):
         return f"{obj.currency.upper()} {obj.total_amount/100:.2f}"
     total_amount_display.short_description = "Total"
 
 @admin.register(OrderPayment)
-class OrderPaymentAdmin(admin.ModelAdmin):
+class OrderPaymentAdmin(LargeTableAdmin):
     list_display = ("session_id", "order", "paid", "created_at")
     list_filter = ("paid",)
-    search_fields = ("session_id",)
+    search_fields = ("session_id__exact",)
+    actions = ("refresh_status",)
+
+    def refresh_status(self, request, queryset):
+        _report_results(self, request, "Refresh from Stripe", stripe_sync.refresh_order_payments(queryset))
+    refresh_status.short_description = "Refresh payment status from Stripe"
 
 @admin.register(Discount)
 class DiscountAdmin(admin.ModelAdmin):
     list_display = ("id", "name", "percent_off", "active", "stripe_coupon_id")
     list_filter = ("active",)
     search_fields = ("name", "stripe_coupon_id")
+    actions = (push_to_stripe,)
 
 @admin.register(Tax)
 class TaxAdmin(admin.ModelAdmin):
     list_display = ("id", "display_name", "percentage", "inclusive", "active", "stripe_tax_rate_id")
     list_filter = ("active", "inclusive")
     search_fields = ("display_name", "stripe_tax_rate_id")
+    actions = (push_to_stripe,)
+
+@admin.register(ArchivedSession)
+class ArchivedSessionAdmin(admin.ModelAdmin):
+    list_display = ("session_id", "kind", "object_id", "created_at", "archived_at")
+    list_filter = ("kind",)
+    search_fields = ("=session_id",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+def _money(cents) -> str:
+    return f"{(cents or 0) / 100:,.2f}"
+
+# дашборд выручки: читает только DailyRevenue (день × валюта), объём истории платежей не важен
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(admin.ModelAdmin):
+    list_display = ("day", "currency", "revenue_display", "order_count", "discount_display", "tax_display")
+    list_filter = ("currency",)
+    date_hierarchy = "day"
+    list_per_page = 100
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def revenue_display(self, obj):
+        return _money(obj.revenue_cents)
+    revenue_display.short_description = "Revenue"
+
+    def discount_display(self, obj):
+        return _money(obj.discount_cents)
+    discount_display.short_description = "Discounts"
+
+    def tax_display(self, obj):
+        return _money(obj.tax_cents)
+    tax_display.short_description = "Taxes"
+
+    # итоги по валютам за отфильтрованный период
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        cl = getattr(response, "context_data", {}).get("cl")
+        if cl is not None:
+            rows = cl.queryset.order_by().values("currency").annotate(
+                revenue_cents=Sum("revenue_cents"), order_count=Sum("order_count"),
+                discount_cents=Sum("discount_cents"), tax_cents=Sum("tax_cents"),
+            ).order_by("currency")
+            response.context_data["revenue_totals"] = [
+                {
+                    "currency": r["currency"].upper(),
+                    "revenue": _money(r["revenue_cents"]),
+                    "order_count": r["order_count"],
+                    "discount": _money(r["discount_cents"]),
+                    "tax": _money(r["tax_cents"]),
+                }
+                for r in rows
+            ]
+        return response
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ("id", "created_at", "method", "path", "status_code", "duration_ms", "sql_count", "sql_ms", "trigger")
+    list_filter = ("trigger", "method", "status_code")
+    search_fields = ("path",)
+    date_hierarchy = "created_at"
+    readonly_fields = ("method", "path", "status_code", "trigger", "duration_ms", "sql_count", "sql_ms",
+                       "created_at", "download_link", "stats_display", "sql_display")
+    exclude = ("profile_file",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path("<int:pk>/download/", self.admin_site.admin_view(self.download_view),
+                 name="catalog_requestprofile_download"),
+        ]
+        return urls + super().get_urls()
+
+    # отдаём .prof файл для snakeviz / pstats
+    def download_view(self, request, pk):
+        record = self.get_object(request, pk)
+        if record is None or not self.has_view_permission(request, record):
+            raise Http404
+        file_path = profiling.profile_path(record)
+        if not file_path.exists():
+            raise Http404
+        return FileResponse(open(file_path, "rb"), as_attachment=True, filename=record.profile_file)
+
+    def download_link(self, obj):
+        return format_html('<a href="{}">{}</a>', reverse("admin:catalog_requestprofile_download", args=[obj.pk]),
+                           obj.profile_file)
+    download_link.short_description = "Profile file"
+
+    def stats_display(self, obj):
+        return format_html("<pre>{}</pre>", profiling.render_stats(obj))
+    stats_display.short_description = "cProfile (cumulative)"
+
+    def sql_display(self, obj):
+        queries = sorted(profiling.load_queries(obj), key=lambda q: q["ms"], reverse=True)
+        if not queries:
+            return "—"
+        return format_html(
+            "<table>{}</table>",
+            format_html_join("", "<tr><td>{} ms</td><td><code>{}</code><br><small>{}</small></td></tr>",
+                             ((f"{q['ms']:.2f}", q["sql"], q["params"]) for q in queries)),
+        )
+    sql_display.short_description = "SQL (slowest first)"
+
+    def delete_model(self, request, obj):
+        profiling.delete_files(obj)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            profiling.delete_files(obj)
+        super().delete_queryset(request, queryset)
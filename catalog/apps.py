@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'catalog'
\ No newline at end of file
+    name = 'catalog'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,54 @@
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...services.retention import SOURCES, NDJSONSink, TableSink, archive_unpaid
+
+
+# выносит брошенные (неоплаченные) CheckoutSession / OrderPayment в архив и удаляет их чанками
+class Command(BaseCommand):
+    help = "Архивирует неоплаченные сессии старше заданного возраста (таблица ArchivedSession или .ndjson.gz)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=float, default=settings.SESSION_ARCHIVE_AFTER_DAYS,
+                            help="Возраст сессии в днях (по умолчанию SESSION_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument("--source", choices=["item", "order", "all"], default="all")
+        parser.add_argument("--to", choices=["table", "ndjson"], default="table", help="Куда складывать архив")
+        parser.add_argument("--output", default=None, help="Путь к .ndjson.gz (для --to ndjson)")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Строк на одну транзакцию")
+        parser.add_argument("--pause", type=float, default=0.0, help="Пауза между чанками, сек")
+
+    def handle(self, *args, **opts):
+        if opts["chunk_size"] <= 0:
+            raise CommandError("--chunk-size должен быть > 0")
+
+        if opts["to"] == "ndjson":
+            output = Path(opts["output"]) if opts["output"] else (
+                settings.BASE_DIR / "archive" / f"sessions-{timezone.now():%Y%m%d-%H%M%S}.ndjson.gz"
+            )
+            output.parent.mkdir(parents=True, exist_ok=True)
+            sink = NDJSONSink(output)
+            self.stdout.write(f"Архив: {output}")
+        else:
+            sink = TableSink()
+
+        sources = list(SOURCES) if opts["source"] == "all" else [opts["source"]]
+        older_than = timedelta(days=opts["older_than_days"])
+        try:
+            for source in sources:
+                stats = None
+                for stats in archive_unpaid(source, older_than, sink, opts["chunk_size"], opts["pause"]):
+                    self.stdout.write(
+                        f"[{source}] +{stats['rows']} (всего {stats['total']}, {stats['rows_per_sec']:.0f} rows/s)"
+                    )
+                if stats is None:
+                    self.stdout.write(f"[{source}] нечего архивировать")
+                else:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"[{source}] архивировано {stats['total']} строк, {stats['rows_per_sec']:.0f} rows/s"
+                    ))
+        finally:
+            sink.close()
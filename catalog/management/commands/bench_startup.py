@@ -0,0 +1,120 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# код, который выполняется в чистом интерпретаторе: импорт WSGI-приложения и первый запрос к /healthz/
+CHILD_SNIPPET = r"""
+import io, json, os, sys, time
+t0 = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+from config.wsgi import application
+t1 = time.perf_counter()
+
+from django.conf import settings
+host = next((h for h in settings.ALLOWED_HOSTS if h and h != "*" and not h.startswith(".")), "localhost")
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": "/healthz/", "QUERY_STRING": "",
+    "SERVER_NAME": host, "SERVER_PORT": "80", "HTTP_HOST": host, "SERVER_PROTOCOL": "HTTP/1.1",
+    "wsgi.version": (1, 0), "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(),
+    "wsgi.errors": sys.stderr, "wsgi.multithread": False, "wsgi.multiprocess": True, "wsgi.run_once": False,
+}
+status = []
+body = b"".join(application(environ, lambda s, h, exc_info=None: status.append(s)))
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_response_ms": (t2 - t1) * 1000,
+    "status": status[0] if status else "",
+    "stripe_loaded": "stripe" in sys.modules,
+}))
+"""
+
+
+# бенчмарк холодного старта: python -X importtime + время до первого ответа /healthz/
+class Command(BaseCommand):
+    help = "Измеряет время импорта и время до первого ответа /healthz/ в свежем процессе"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=3, help="Сколько холодных стартов усреднять")
+        parser.add_argument("--top", type=int, default=15, help="Сколько самых тяжёлых импортов показать")
+        parser.add_argument("--json", action="store_true", help="Вывести результат одной JSON-строкой")
+        parser.add_argument("--max-startup-ms", type=float, default=None,
+                            help="Порог для процесс-старт → первый ответ; при превышении команда падает")
+        parser.add_argument("--fail-if-stripe-loaded", action="store_true",
+                            help="Упасть, если stripe SDK импортирован до первого checkout-запроса")
+
+    def handle(self, *args, **opts):
+        runs = [self._run_once() for _ in range(max(1, opts["runs"]))]
+        best = min(runs, key=lambda r: r["startup_ms"])
+
+        result = {
+            "runs": len(runs),
+            "startup_ms": best["startup_ms"],
+            "process_ms": best["process_ms"],
+            "import_ms": best["import_ms"],
+            "first_response_ms": best["first_response_ms"],
+            "status": best["status"],
+            "stripe_loaded": best["stripe_loaded"],
+            "top_imports": best["top_imports"][:opts["top"]],
+        }
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(result))
+        else:
+            self.stdout.write(
+                f"cold start (best of {result['runs']}): {result['startup_ms']:.1f} ms "
+                f"[import {result['import_ms']:.1f} ms + first /healthz/ {result['first_response_ms']:.1f} ms], "
+                f"process wall {result['process_ms']:.1f} ms"
+            )
+            self.stdout.write(f"status: {result['status']}, stripe loaded: {result['stripe_loaded']}")
+            self.stdout.write("heaviest top-level imports (cumulative ms):")
+            for name, ms in result["top_imports"]:
+                self.stdout.write(f"  {ms:9.1f}  {name}")
+
+        limit = opts["max_startup_ms"]
+        if limit is not None and result["startup_ms"] > limit:
+            raise CommandError(f"Холодный старт {result['startup_ms']:.1f} ms превышает порог {limit:.1f} ms")
+        if opts["fail_if_stripe_loaded"] and result["stripe_loaded"]:
+            raise CommandError("stripe SDK импортируется при старте — ленивый импорт сломан")
+
+    def _run_once(self) -> dict:
+        env = dict(os.environ)
+        env["PYTHONDONTWRITEBYTECODE"] = "1"
+
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD_SNIPPET],
+            cwd=str(settings.BASE_DIR), env=env, capture_output=True, text=True,
+        )
+        process_ms = (time.perf_counter() - started) * 1000
+        if proc.returncode != 0:
+            raise CommandError(f"Дочерний процесс упал:\n{proc.stderr[-2000:]}")
+
+        stats = json.loads(proc.stdout.strip().splitlines()[-1])
+        stats["process_ms"] = process_ms
+        stats["startup_ms"] = stats["import_ms"] + stats["first_response_ms"]
+        stats["top_imports"] = self._parse_importtime(proc.stderr)
+        return stats
+
+    # строки вида "import time:   self [us] |  cumulative | name"; верхний уровень — без отступа в name
+    @staticmethod
+    def _parse_importtime(stderr: str) -> list:
+        top = []
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            try:
+                _, cumulative, name = line[len("import time:"):].split("|", 2)
+                cumulative_us = int(cumulative.strip())
+            except ValueError:
+                continue
+            if not name.startswith(" ") or name.startswith("  "):
+                continue
+            top.append((name.strip(), cumulative_us / 1000))
+        top.sort(key=lambda x: x[1], reverse=True)
+        return top
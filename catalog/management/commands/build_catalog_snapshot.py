@@ -0,0 +1,27 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services import snapshot
+
+
+# собирает read-only снимок каталога для воркеров (settings.CATALOG_SNAPSHOT_PATH)
+# запускать после деплоя и после массовых изменений Item в обход save() (bulk_create, update())
+class Command(BaseCommand):
+    help = "Собирает mmap-снимок Item (id, цена, валюта, строки) и атомарно подменяет файл"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=None, help="По умолчанию settings.CATALOG_SNAPSHOT_PATH")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        path = Path(opts["path"]) if opts["path"] else snapshot.snapshot_path()
+        if path is None:
+            raise CommandError("CATALOG_SNAPSHOT_PATH не задан, укажите --path")
+        started = time.perf_counter()
+        count, version = snapshot.build(path, chunk_size=opts["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{path}: {count} товаров, {path.stat().st_size / 1024:,.0f} KB, версия {version}, "
+            f"за {time.perf_counter() - started:.1f} s"
+        ))
@@ -0,0 +1,108 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ...admin import CURSOR_VAR
+from ...models import CheckoutSession, Item, OrderPayment
+
+
+class _Rollback(Exception):
+    pass
+
+
+# бюджет времени SQL для changelist-страниц CheckoutSession/OrderPayment в админке
+# гоняет типовые запросы (первая страница, фильтры, глубокая страница по cursor, поиск) против текущей БД —
+# на объёмах generate_data — и падает, если медиана SQL-времени страницы выше --budget-ms
+# временный суперпользователь и его сессия создаются в транзакции, которая откатывается
+class Command(BaseCommand):
+    help = "Проверяет, что changelist больших таблиц в админке укладываются в бюджет времени SQL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget-ms", type=float, default=200.0, help="Порог SQL-времени на одну страницу")
+        parser.add_argument("--runs", type=int, default=3, help="Сколько раз запрашивать каждую страницу (медиана)")
+        parser.add_argument("--json", action="store_true", help="Вывести результат одной JSON-строкой")
+
+    def handle(self, *args, **opts):
+        results = []
+        try:
+            with transaction.atomic():
+                client = self._client()
+                for model in (CheckoutSession, OrderPayment):
+                    url = reverse(f"admin:catalog_{model._meta.model_name}_changelist")
+                    for label, params in self._scenarios(model):
+                        results.append(self._measure(client, model, label, url, params, max(1, opts["runs"])))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        budget = opts["budget_ms"]
+        over = [r for r in results if r["status"] != 200 or r["sql_ms"] > budget]
+        if opts["json"]:
+            self.stdout.write(json.dumps({"budget_ms": budget, "pages": results}))
+        else:
+            for r in results:
+                self.stdout.write(
+                    f"{r['model']:16} {r['page']:12} status {r['status']}  sql {r['sql_ms']:8.1f} ms "
+                    f"({r['queries']} queries, slowest {r['slowest_ms']:.1f} ms)  wall {r['wall_ms']:8.1f} ms"
+                )
+        if over:
+            names = ", ".join(f"{r['model']}/{r['page']}" for r in over)
+            raise CommandError(f"Превышен бюджет {budget:.0f} ms или ошибка страницы: {names}")
+
+    def _client(self) -> Client:
+        host = next((h for h in settings.ALLOWED_HOSTS if h and h != "*" and not h.startswith(".")), "localhost")
+        user = get_user_model().objects.create_superuser(
+            username=f"admin-budget-{time.time_ns()}", email="", password=None,
+        )
+        client = Client(HTTP_HOST=host, secure=getattr(settings, "SECURE_SSL_REDIRECT", False))
+        client.force_login(user)
+        return client
+
+    # (название, GET-параметры); глубокая страница — cursor от строки из середины таблицы по id
+    def _scenarios(self, model) -> list:
+        scenarios = [
+            ("first", {}),
+            ("paid", {"paid__exact": "1"}),
+            ("unpaid", {"paid__exact": "0"}),
+        ]
+        if model is CheckoutSession:
+            currency = Item.objects.values_list("currency", flat=True).order_by("currency").first()
+            if currency:
+                scenarios.append(("currency", {"item__currency": currency}))
+
+        last_id = model.objects.order_by("-id").values_list("id", flat=True).first()
+        middle = model.objects.filter(id__gte=(last_id or 0) // 2).order_by("id").first()
+        if middle is not None:
+            scenarios.append(("deep", {CURSOR_VAR: f"{middle.created_at.isoformat()},{middle.pk}"}))
+            scenarios.append(("deep+paid", {CURSOR_VAR: f"{middle.created_at.isoformat()},{middle.pk}",
+                                            "paid__exact": "1"}))
+            scenarios.append(("search", {"q": middle.session_id}))
+        return scenarios
+
+    def _measure(self, client, model, label, url, params, runs) -> dict:
+        samples = []
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = client.get(url, params)
+                wall_ms = (time.perf_counter() - started) * 1000
+            times = [float(q["time"]) * 1000 for q in ctx.captured_queries]
+            samples.append({
+                "status": response.status_code,
+                "sql_ms": sum(times),
+                "slowest_ms": max(times, default=0.0),
+                "queries": len(times),
+                "wall_ms": wall_ms,
+            })
+        median = statistics.median_low([s["sql_ms"] for s in samples])
+        sample = next(s for s in samples if s["sql_ms"] == median)
+        status = next((s["status"] for s in samples if s["status"] != 200), 200)
+        return {"model": model.__name__, "page": label, **sample, "status": status}
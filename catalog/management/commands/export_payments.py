@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services.export import FORMATS, PAID_CHOICES, iter_payment_rows, parse_day
+
+
+# потоковая выгрузка платежей в CSV / NDJSON (в файл или stdout)
+class Command(BaseCommand):
+    help = "Выгружает CheckoutSession/OrderPayment с суммами, скидками и налогами"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=list(FORMATS), default="csv")
+        parser.add_argument("--since", default=None, help="YYYY-MM-DD, включительно")
+        parser.add_argument("--until", default=None, help="YYYY-MM-DD, включительно")
+        parser.add_argument("--currency", default=None)
+        parser.add_argument("--paid", choices=list(PAID_CHOICES), default="paid")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--output", default="-", help="Файл для записи, '-' — stdout")
+
+    def handle(self, *args, **opts):
+        dates = {}
+        for name in ("since", "until"):
+            if opts[name]:
+                dates[name] = parse_day(opts[name])
+                if dates[name] is None:
+                    raise CommandError(f"Некорректная дата --{name}: {opts[name]}")
+
+        rows = iter_payment_rows(
+            since=dates.get("since"),
+            until=dates.get("until"),
+            currency=opts["currency"],
+            paid=PAID_CHOICES[opts["paid"]],
+            chunk_size=opts["chunk_size"],
+        )
+        stream, _ = FORMATS[opts["format"]]
+
+        if opts["output"] == "-":
+            for chunk in stream(rows):
+                self.stdout.write(chunk, ending="")
+            return
+
+        with open(opts["output"], "w", encoding="utf-8", newline="") as out:
+            for chunk in stream(rows):
+                out.write(chunk)
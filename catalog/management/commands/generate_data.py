@@ -0,0 +1,313 @@
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from ...models import CheckoutSession, Discount, Item, Order, OrderPayment, Tax
+from ...services import snapshot
+from ...services.export import parse_day
+
+CURRENCIES = [("usd", 0.75), ("eur", 0.25)]
+ADJECTIVES = ["Red", "Blue", "Classic", "Smart", "Eco", "Mini", "Pro", "Vintage", "Wireless", "Compact"]
+NOUNS = ["Mug", "Lamp", "Book", "Chair", "Headphones", "Backpack", "Watch", "Notebook", "Bottle", "Keyboard"]
+DISCOUNT_PERCENTS = [(5, 20), (10, 35), (15, 15), (20, 15), (25, 8), (50, 5), (90, 2)]
+TAX_RATES = [("VAT", "20.00"), ("VAT", "10.00"), ("MwSt", "19.00"), ("IVA", "21.00"), ("Sales tax", "7.25")]
+# доли заказов со смешанными валютами (оплачиваются split-группами) и позиций с количеством больше 1
+SPLIT_ORDER_SHARE = 0.05
+MULTI_QUANTITY_SHARE = 0.15
+# фиксированная точка отсчёта created_at: один и тот же --seed даёт одни и те же данные в любой день
+DEFAULT_UNTIL = "2026-01-01"
+
+
+# auto_now_add перезаписывает created_at при вставке — на время генерации отключаем
+@contextmanager
+def _explicit_created_at(*models):
+    fields = [m._meta.get_field("created_at") for m in models]
+    saved = [f.auto_now_add for f in fields]
+    for f in fields:
+        f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, value in zip(fields, saved):
+            f.auto_now_add = value
+
+
+# генератор объёмных данных для нагрузочного тестирования (детерминирован по --seed)
+class Command(BaseCommand):
+    help = "Генерирует Item/Order/Discount/Tax/CheckoutSession/OrderPayment пачками через bulk_create"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=10_000)
+        parser.add_argument("--orders", type=int, default=100_000)
+        parser.add_argument("--discounts", type=int, default=50)
+        parser.add_argument("--taxes", type=int, default=10)
+        parser.add_argument("--sessions", type=int, default=200_000, help="CheckoutSession (покупки одного товара)")
+        parser.add_argument("--order-payments", type=int, default=150_000)
+        parser.add_argument("--days", type=int, default=365, help="На сколько дней назад размазывать created_at")
+        parser.add_argument("--until", default=DEFAULT_UNTIL, help="Самая поздняя дата created_at, YYYY-MM-DD")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--check-constraints", action="store_true",
+                            help="Проверить FK после загрузки (на больших объёмах долго)")
+
+    def handle(self, *args, **opts):
+        if opts["batch_size"] <= 0:
+            raise CommandError("--batch-size должен быть > 0")
+        self.rng = random.Random(opts["seed"])
+        self.seed = opts["seed"]
+        self.batch_size = opts["batch_size"]
+        until = parse_day(opts["until"])
+        if until is None:
+            raise CommandError(f"Некорректная дата --until: {opts['until']}")
+        self.until = datetime(until.year, until.month, until.day, tzinfo=dt_timezone.utc)
+        self.span_seconds = max(1, opts["days"]) * 86400
+        # заказы этого запуска со смешанными валютами: id -> валюты частей split-оплаты
+        self.split_orders = {}
+
+        models = [Item, Discount, Tax, Order, Order.items.through, Order.taxes.through, CheckoutSession, OrderPayment]
+        started = time.perf_counter()
+        with _explicit_created_at(CheckoutSession, Order, OrderPayment), connection.constraint_checks_disabled():
+            self._load("Tax", self._taxes(opts["taxes"]))
+            self._load("Discount", self._discounts(opts["discounts"]))
+            self._load("Item", self._items(opts["items"]))
+            self._load_orders(opts["orders"])
+            self._load("CheckoutSession", self._sessions(opts["sessions"]))
+            self._load("OrderPayment", self._order_payments(opts["order_payments"]))
+
+        # id задавались явно — двигаем последовательности (Postgres), иначе следующие INSERT упадут
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+        if opts["check_constraints"]:
+            connection.check_constraints(table_names=[m._meta.db_table for m in models])
+
+        # bulk_create сигналов не шлёт — снимок каталога пересобираем сами
+        if opts["items"] and snapshot.snapshot_path() is not None:
+            count, _ = snapshot.build()
+            self.stdout.write(f"Снимок каталога: {count} товаров")
+
+        self.stdout.write(self.style.SUCCESS(f"Готово за {time.perf_counter() - started:.1f} s"))
+
+    # ---- загрузка ----
+
+    def _next_id(self, model) -> int:
+        last = model.objects.order_by("-id").values_list("id", flat=True).first()
+        return (last or 0) + 1
+
+    def _bulk_insert(self, batch) -> None:
+        with transaction.atomic():
+            type(batch[0]).objects.bulk_create(batch, batch_size=self.batch_size)
+
+    # batches — генератор списков объектов одной модели
+    def _load(self, label: str, batches) -> None:
+        total = 0
+        started = time.perf_counter()
+        for batch in batches:
+            if batch:
+                self._bulk_insert(batch)
+                total += len(batch)
+        self._report(label, total, started)
+
+    def _report(self, label: str, total: int, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(f"{label}: {total} rows, {elapsed:.1f} s, {rate:,.0f} rows/s")
+
+    def _chunks(self, count: int):
+        for start in range(0, count, self.batch_size):
+            yield start, min(self.batch_size, count - start)
+
+    def _created_at(self) -> datetime:
+        # больше свежих данных, чем старых
+        age = self.span_seconds * (self.rng.random() ** 1.5)
+        return self.until - timedelta(seconds=age)
+
+    # момент через случайную задержку (чаще короткую) после start, не позже --until
+    def _after(self, start: datetime, max_seconds: int) -> datetime:
+        return min(self.until, start + timedelta(seconds=max_seconds * self.rng.random() ** 3))
+
+    def _weighted(self, choices):
+        values, weights = zip(*choices)
+        return self.rng.choices(values, weights=weights)[0]
+
+    # ---- справочники ----
+
+    def _taxes(self, count: int):
+        first = self._next_id(Tax)
+        yield [
+            Tax(
+                id=first + n,
+                display_name=name,
+                percentage=Decimal(rate),
+                inclusive=self.rng.random() < 0.3,
+                active=self.rng.random() < 0.9,
+            )
+            for n, (name, rate) in enumerate(self.rng.choice(TAX_RATES) for _ in range(count))
+        ]
+
+    def _discounts(self, count: int):
+        first = self._next_id(Discount)
+        batch = []
+        for n in range(count):
+            percent = self._weighted(DISCOUNT_PERCENTS)
+            batch.append(Discount(
+                id=first + n,
+                name=f"PROMO{percent}-{n}",
+                percent_off=percent,
+                active=self.rng.random() < 0.8,
+            ))
+        yield batch
+
+    def _items(self, count: int):
+        first = self._next_id(Item)
+        for start, size in self._chunks(count):
+            batch = []
+            for n in range(start, start + size):
+                batch.append(Item(
+                    id=first + n,
+                    name=f"{self.rng.choice(ADJECTIVES)} {self.rng.choice(NOUNS)} #{first + n}",
+                    description="" if self.rng.random() < 0.6 else "Generated item for load testing",
+                    # лог-нормальное распределение цены: медиана ~ $18, длинный хвост
+                    price=max(50, min(500_000, int(self.rng.lognormvariate(7.5, 1.0)))),
+                    currency=self._weighted(CURRENCIES),
+                ))
+            yield batch
+
+    # ---- заказы с M2M ----
+
+    def _load_orders(self, count: int) -> None:
+        items_by_currency = {}
+        for item_id, currency in Item.objects.order_by("pk").values_list("id", "currency").iterator(chunk_size=50_000):
+            items_by_currency.setdefault(currency.lower(), []).append(item_id)
+        if count and not items_by_currency:
+            raise CommandError("Нет ни одного Item — сгенерируйте товары (--items)")
+        currencies = [(c, w) for c, w in CURRENCIES if c in items_by_currency] or \
+            [(c, 1) for c in items_by_currency]
+        discount_ids = list(Discount.objects.order_by("pk").values_list("id", flat=True))
+        tax_ids = list(Tax.objects.order_by("pk").values_list("id", flat=True))
+
+        OrderItem = Order.items.through
+        OrderTax = Order.taxes.through
+        first = self._next_id(Order)
+        totals = {"Order": 0, "Order.items": 0, "Order.taxes": 0}
+        started = time.perf_counter()
+
+        for start, size in self._chunks(count):
+            orders, order_items, order_taxes = [], [], []
+            for n in range(start, start + size):
+                order_id = first + n
+                currency = self._weighted(currencies)
+                pool = items_by_currency[currency]
+                others = [c for c in items_by_currency if c != currency]
+                extra_currency = self.rng.choice(others) if others and self.rng.random() < SPLIT_ORDER_SHARE else None
+                orders.append(Order(
+                    id=order_id,
+                    currency=currency,
+                    created_at=self._created_at(),
+                    paid=self.rng.random() < 0.3,
+                    discount_id=self.rng.choice(discount_ids) if discount_ids and self.rng.random() < 0.25 else None,
+                ))
+
+                # 1..10 позиций, популярные товары встречаются чаще (квадрат равномерного ~ Zipf)
+                lines = min(10, len(pool), 1 + int(self.rng.expovariate(0.6)))
+                picked = set()
+                while len(picked) < lines:
+                    picked.add(pool[int(len(pool) * self.rng.random() ** 2)])
+                if extra_currency:
+                    # смешанный заказ: ещё 1..2 товара другой валюты, оплата — split-группой
+                    extra_pool = items_by_currency[extra_currency]
+                    for _ in range(self.rng.randint(1, 2)):
+                        picked.add(extra_pool[int(len(extra_pool) * self.rng.random() ** 2)])
+                    self.split_orders[order_id] = (currency, extra_currency)
+                order_items.extend(
+                    OrderItem(order_id=order_id, item_id=item_id,
+                              quantity=1 if self.rng.random() >= MULTI_QUANTITY_SHARE else self.rng.randint(2, 5))
+                    for item_id in sorted(picked)
+                )
+
+                if tax_ids:
+                    tax_count = self._weighted([(0, 30), (1, 60), (2, 10)])
+                    for tax_id in self.rng.sample(tax_ids, min(tax_count, len(tax_ids))):
+                        order_taxes.append(OrderTax(order_id=order_id, tax_id=tax_id))
+
+            with transaction.atomic():
+                Order.objects.bulk_create(orders, batch_size=self.batch_size)
+                OrderItem.objects.bulk_create(order_items, batch_size=self.batch_size)
+                OrderTax.objects.bulk_create(order_taxes, batch_size=self.batch_size)
+            totals["Order"] += len(orders)
+            totals["Order.items"] += len(order_items)
+            totals["Order.taxes"] += len(order_taxes)
+
+        for label, total in totals.items():
+            self._report(label, total, started)
+
+    # ---- сессии оплаты ----
+
+    def _sessions(self, count: int):
+        item_ids = list(Item.objects.order_by("pk").values_list("id", flat=True))
+        if count and not item_ids:
+            raise CommandError("Нет ни одного Item для CheckoutSession")
+        first = self._next_id(CheckoutSession)
+        for start, size in self._chunks(count):
+            batch = []
+            for n in range(start, start + size):
+                created_at = self._created_at()
+                paid = self.rng.random() < 0.35
+                batch.append(CheckoutSession(
+                    id=first + n,
+                    item_id=item_ids[int(len(item_ids) * self.rng.random() ** 2)],
+                    session_id=f"cs_gen_{self.seed}_{first + n}",
+                    paid=paid,
+                    created_at=created_at,
+                    paid_at=self._after(created_at, 3600) if paid else None,
+                ))
+            yield batch
+
+    # оплата создаётся после своего заказа (до 2 суток), оплачивается в течение часа
+    # у заказа со смешанными валютами одна попытка оплаты — split-группа из частей по валютам
+    # (оплачены либо все части, либо ни одной); count — число строк
+    def _order_payments(self, count: int):
+        # компактно: миллионы заказов не должны превращаться в миллионы кортежей
+        order_ids, order_paid_flags, order_created = array("q"), bytearray(), array("d")
+        rows = Order.objects.order_by("pk").values_list("id", "paid", "created_at")
+        for order_id, order_paid, created_at in rows.iterator(chunk_size=50_000):
+            order_ids.append(order_id)
+            order_paid_flags.append(order_paid)
+            order_created.append(created_at.timestamp())
+        if count and not order_ids:
+            raise CommandError("Нет ни одного Order для OrderPayment")
+        next_id = self._next_id(OrderPayment)
+        remaining = count
+        while remaining > 0:
+            batch = []
+            while remaining > 0 and len(batch) < self.batch_size:
+                idx = self.rng.randrange(len(order_ids))
+                order_id, order_paid = order_ids[idx], bool(order_paid_flags[idx])
+                created_at = self._after(datetime.fromtimestamp(order_created[idx], dt_timezone.utc), 2 * 86400)
+                paid = order_paid and self.rng.random() < 0.8
+                paid_at = self._after(created_at, 3600) if paid else None
+                parts = self.split_orders.get(order_id, ("",))
+                group = f"gen{self.seed}_{next_id}" if len(parts) > 1 else ""
+                for currency in parts:
+                    batch.append(OrderPayment(
+                        id=next_id,
+                        order_id=order_id,
+                        session_id=f"cs_genop_{self.seed}_{next_id}",
+                        paid=paid,
+                        created_at=created_at,
+                        paid_at=paid_at,
+                        currency=currency,
+                        group=group,
+                        group_parts=len(parts) if group else 0,
+                    ))
+                    next_id += 1
+                    remaining -= 1
+            yield batch
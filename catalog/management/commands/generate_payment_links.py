@@ -0,0 +1,183 @@
+import csv
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import Order, OrderPayment
+from ...services.concurrency import RateLimiter, run_concurrently
+from ...services.export import _date_range_filter, parse_day
+from ...services.pricing import charged_amounts, quote_order, with_pricing_data
+from ...services.stripe_api import _stripe, checkout_params_for_order
+
+COLUMNS = ["order_id", "session_id", "url", "error"]
+RATE_LIMIT_RETRIES = 3
+
+
+def _batched(iterable, size: int):
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
+
+# заказы, для которых ссылка уже есть в CSV прошлого запуска (строки с ошибкой повторяем)
+def _done_order_ids(path: Path) -> set:
+    with open(path, newline="", encoding="utf-8") as fh:
+        return {int(row["order_id"]) for row in csv.DictReader(fh) if row.get("session_id")}
+
+
+# Checkout-ссылки для большого числа заказов (рассылки)
+# параметры сессий и купоны/налоги готовятся в основном потоке, в пуле — только вызовы Stripe
+# с ограничением частоты на каждый аккаунт; OrderPayment пишутся bulk_create, ссылки — в CSV по мере готовности
+# повторный запуск с тем же --output продолжает с места остановки: готовые заказы пропускаются,
+# а сессии, созданные перед падением, Stripe вернёт повторно по idempotency key (в течение суток)
+class Command(BaseCommand):
+    help = "Создаёт Checkout Sessions для списка заказов и пишет ссылки в CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", default="", help="Id заказов через запятую")
+        parser.add_argument("--ids-file", default=None, help="Файл с id заказов (по одному в строке), '-' — stdin")
+        parser.add_argument("--currency", default=None, help="Фильтр заказов по валюте")
+        parser.add_argument("--since", default=None, help="Заказы, созданные с YYYY-MM-DD")
+        parser.add_argument("--until", default=None, help="Заказы, созданные по YYYY-MM-DD включительно")
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--output", required=True, help="CSV со ссылками (дописывается при повторном запуске)")
+        parser.add_argument("--campaign", default=None,
+                            help="Префикс idempotency key; по умолчанию — имя файла --output")
+        parser.add_argument("--concurrency", type=int, default=None,
+                            help="Размер пула потоков (по умолчанию STRIPE_SYNC_CONCURRENCY)")
+        parser.add_argument("--rate", type=float, default=None,
+                            help="Запросов в секунду на аккаунт (по умолчанию STRIPE_RATE_LIMIT, 0 — без лимита)")
+        parser.add_argument("--chunk-size", type=int, default=200)
+
+    def handle(self, *args, **opts):
+        if opts["chunk_size"] <= 0:
+            raise CommandError("--chunk-size должен быть > 0")
+        output = Path(opts["output"])
+        self.campaign = opts["campaign"] or output.stem
+        self.max_workers = opts["concurrency"]
+        rate = opts["rate"] if opts["rate"] is not None else getattr(settings, "STRIPE_RATE_LIMIT", 20)
+        self.limiter = RateLimiter(rate)
+
+        done = _done_order_ids(output) if output.exists() else set()
+        if done:
+            self.stdout.write(f"Продолжаем {output}: уже готово {len(done)} заказов")
+
+        order_ids = (i for i in self._order_ids(opts) if i not in done)
+        if opts["limit"] is not None:
+            order_ids = islice(order_ids, opts["limit"])
+
+        totals = {"ok": 0, "failed": 0}
+        started = time.perf_counter()
+        write_header = not output.exists() or output.stat().st_size == 0
+        with open(output, "a", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=COLUMNS)
+            if write_header:
+                writer.writeheader()
+            for chunk in _batched(order_ids, opts["chunk_size"]):
+                for row in self._process(chunk):
+                    writer.writerow(row)
+                    totals["failed" if row["error"] else "ok"] += 1
+                fh.flush()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"ok {totals['ok']}, ошибок {totals['failed']}, "
+                    f"{(totals['ok'] + totals['failed']) / elapsed:,.1f} заказов/с"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: ссылок {totals['ok']}, ошибок {totals['failed']} за {time.perf_counter() - started:.1f} s"
+        ))
+
+    # ---- выбор заказов ----
+
+    def _order_ids(self, opts):
+        if opts["ids"] or opts["ids_file"]:
+            yield from self._explicit_ids(opts)
+            return
+
+        flt = {}
+        for name in ("since", "until"):
+            if opts[name]:
+                flt[name] = parse_day(opts[name])
+                if flt[name] is None:
+                    raise CommandError(f"Некорректная дата --{name}: {opts[name]}")
+        qs = Order.objects.filter(paid=False, **_date_range_filter("created_at", flt.get("since"), flt.get("until")))
+        if opts["currency"]:
+            qs = qs.filter(currency__iexact=opts["currency"])
+        yield from qs.order_by("id").values_list("id", flat=True).iterator(chunk_size=2000)
+
+    def _explicit_ids(self, opts):
+        yield from self._parse_ids(opts["ids"].split(","))
+        if opts["ids_file"] == "-":
+            yield from self._parse_ids(sys.stdin)
+        elif opts["ids_file"]:
+            with open(opts["ids_file"], encoding="utf-8") as fh:
+                yield from self._parse_ids(fh)
+
+    def _parse_ids(self, lines):
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield int(line)
+            except ValueError:
+                raise CommandError(f"Некорректный id заказа: {line!r}")
+
+    # ---- одна пачка заказов ----
+
+    def _process(self, order_ids) -> list:
+        orders = with_pricing_data(Order.objects.filter(id__in=order_ids))
+        by_id = {o.id: o for o in orders}
+
+        rows, jobs = [], []
+        for order_id in order_ids:
+            order = by_id.get(order_id)
+            if order is None:
+                rows.append(self._row(order_id, error="заказ не найден"))
+            elif order.paid:
+                rows.append(self._row(order_id, error="заказ уже оплачен"))
+            else:
+                try:
+                    jobs.append({"order": order, "params": checkout_params_for_order(order),
+                                 "amounts": charged_amounts(quote_order(order))})
+                except Exception as e:
+                    rows.append(self._row(order_id, error=str(e)))
+
+        results = run_concurrently(self._create, jobs, self.max_workers)
+        created = [job for job, error in results if error is None]
+        # ignore_conflicts: сессия, возвращённая по idempotency key, могла быть записана до падения
+        OrderPayment.objects.bulk_create(
+            [OrderPayment(order=job["order"], session_id=job["session"].id, **job["amounts"]) for job in created],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+        for job, error in results:
+            if error is not None:
+                rows.append(self._row(job["order"].id, error=getattr(error, "user_message", None) or str(error)))
+            else:
+                rows.append(self._row(job["order"].id, session_id=job["session"].id, url=job["session"].url))
+        return rows
+
+    # выполняется в пуле потоков: только Stripe, без БД
+    def _create(self, job) -> None:
+        stripe = _stripe()
+        params = job["params"]
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            self.limiter.acquire(params["api_key"])
+            try:
+                job["session"] = stripe.checkout.Session.create(
+                    **params, idempotency_key=f"paylink-{self.campaign}-{job['order'].id}",
+                )
+                return
+            except stripe.error.RateLimitError:
+                if attempt == RATE_LIMIT_RETRIES:
+                    raise
+                time.sleep(0.5 * 2 ** attempt)
+
+    def _row(self, order_id, session_id="", url="", error="") -> dict:
+        return {"order_id": order_id, "session_id": session_id, "url": url, "error": error}
@@ -0,0 +1,154 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+# профилирование запроса по требованию
+# триггеры: ?_profile=1 от staff, заголовок X-Profile-Token (make_profile_token), сэмплирование PROFILING_SAMPLE_RATE
+# при PROFILING_ENABLED=False middleware снимается с цепочки при старте и ничего не стоит
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = float(getattr(settings, "PROFILING_SAMPLE_RATE", 0.0))
+
+    def __call__(self, request):
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        from .services.profiling import profile_request
+        return profile_request(request, self.get_response, trigger)
+
+    def _trigger(self, request):
+        if "_profile" in request.META.get("QUERY_STRING", "") and request.GET.get("_profile"):
+            user = getattr(request, "user", None)
+            if user is not None and user.is_active and user.is_staff:
+                return "staff"
+
+        token = request.META.get("HTTP_X_PROFILE_TOKEN")
+        if token:
+            from .services.profiling import is_valid_profile_token
+            if is_valid_profile_token(token, getattr(request, "user", None)):
+                return "token"
+
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+
+# лимит одновременных запросов для группы маршрутов + короткая очередь ожидания
+# лимит подстраивается под латентность группы: когда Stripe тормозит, пропускаем меньше запросов,
+# чтобы остальные воркеры (страницы, webhook, /healthz/) оставались свободными
+class AdmissionGroup:
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, name: str, max_concurrency: int = 8, min_concurrency: int = 1, queue_size: int = 8,
+                 queue_timeout: float = 0.5, target_latency: float = 1.0, retry_after: int = 2, **_):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        self.retry_after = retry_after
+
+        self.limit = max_concurrency
+        self.active = 0
+        self.waiting = 0
+        self.latency = None
+        self._cond = threading.Condition()
+
+    # True — запрос допущен; False — группа и очередь заполнены или ожидание истекло
+    def acquire(self) -> bool:
+        with self._cond:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+            if self.waiting >= self.queue_size:
+                return False
+
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self, duration: float) -> None:
+        with self._cond:
+            self.active -= 1
+            self._observe(duration)
+            self._cond.notify(max(1, self.limit - self.active))
+
+    # EWMA латентности -> лимит = max_concurrency * target / latency (в пределах [min, max])
+    def _observe(self, duration: float) -> None:
+        if self.latency is None:
+            self.latency = duration
+        else:
+            self.latency += self.EWMA_ALPHA * (duration - self.latency)
+        ratio = min(1.0, self.target_latency / self.latency) if self.latency > 0 else 1.0
+        self.limit = max(self.min_concurrency, min(self.max_concurrency, round(self.max_concurrency * ratio)))
+
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+# группа admission control по имени — одна на процесс для middleware и view, которые ходят в Stripe сами
+# (страница /order-intent/ с prefetch); None — такой группы нет в settings.ADMISSION_CONTROL
+def admission_group(name: str) -> AdmissionGroup | None:
+    group = _groups.get(name)
+    if group is None:
+        options = (getattr(settings, "ADMISSION_CONTROL", None) or {}).get(name)
+        if options is None:
+            return None
+        with _groups_lock:
+            group = _groups.setdefault(name, AdmissionGroup(name, **options))
+    return group
+
+
+# admission control для тяжёлых маршрутов (settings.ADMISSION_CONTROL: группа -> префиксы путей и лимиты)
+# запросы сверх лимита и очереди получают быстрый 503 с Retry-After, остальные маршруты не ограничиваются
+# лимиты действуют в пределах процесса, поэтому gunicorn запускается с gthread-воркерами (gunicorn.conf.py):
+# с sync-воркером процесс обрабатывает один запрос за раз, и ограничивать внутри него нечего
+class AdmissionControlMiddleware:
+    def __init__(self, get_response):
+        config = getattr(settings, "ADMISSION_CONTROL", None)
+        if not config:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.routes = []
+        for name, options in config.items():
+            group = admission_group(name)
+            for prefix in options.get("paths", ()):
+                self.routes.append((prefix, group))
+        self.prefixes = tuple(prefix for prefix, _ in self.routes)
+
+    def __call__(self, request):
+        path = request.path_info
+        if not path.startswith(self.prefixes):
+            return self.get_response(request)
+
+        group = next(g for prefix, g in self.routes if path.startswith(prefix))
+        if not group.acquire():
+            response = JsonResponse(
+                {"error": "Сервис оплаты перегружен, повторите попытку чуть позже"}, status=503,
+            )
+            response["Retry-After"] = str(group.retry_after)
+            return response
+
+        started = time.monotonic()
+        try:
+            return self.get_response(request)
+        finally:
+            group.release(time.monotonic() - started)
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_tax_order_taxes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('status_code', models.PositiveSmallIntegerField(default=0)),
+                ('trigger', models.CharField(choices=[('staff', 'Staff (?_profile=1)'), ('token', 'Signed header'), ('sample', 'Sampling')], max_length=16)),
+                ('duration_ms', models.FloatField(default=0)),
+                ('sql_count', models.PositiveIntegerField(default=0)),
+                ('sql_ms', models.FloatField(default=0)),
+                ('profile_file', models.CharField(help_text='Имя .prof файла в PROFILING_DIR', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_requestprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='stripe_product_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_item_stripe_product_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Item'), (2, 'Order')])),
+                ('session_id', models.CharField(max_length=255)),
+                ('object_id', models.PositiveBigIntegerField(help_text='Item.id или Order.id')),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_archivedsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderpayment',
+            name='currency',
+            field=models.CharField(blank=True, default='', help_text='Валюта части (split-оплата)', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='orderpayment',
+            name='group',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Общий id частей одной split-оплаты', max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='orderpayment',
+            name='session_id',
+            field=models.CharField(help_text='Checkout Session или PaymentIntent id', max_length=255, unique=True),
+        ),
+    ]
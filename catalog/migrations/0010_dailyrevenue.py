@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_orderpayment_split'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('currency', models.CharField(max_length=3)),
+                ('revenue_cents', models.BigIntegerField(default=0)),
+                ('order_count', models.PositiveIntegerField(default=0, help_text='Оплаченные покупки Item и оплаты заказов')),
+                ('discount_cents', models.BigIntegerField(default=0)),
+                ('tax_cents', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-day', 'currency'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrevenue',
+            constraint=models.UniqueConstraint(fields=('day', 'currency'), name='dailyrevenue_day_currency_uniq'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Order.items получает явную промежуточную модель OrderItem поверх уже существующей таблицы
+# catalog_order_items (данные не переносятся), затем к ней добавляется quantity
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_dailyrevenue'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='OrderItem',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='catalog.order')),
+                        ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_lines', to='catalog.item')),
+                    ],
+                    options={
+                        'db_table': 'catalog_order_items',
+                        'unique_together': {('order', 'item')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='order',
+                    name='items',
+                    field=models.ManyToManyField(related_name='orders', through='catalog.OrderItem', to='catalog.item'),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='quantity',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
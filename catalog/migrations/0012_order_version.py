@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_orderitem_quantity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
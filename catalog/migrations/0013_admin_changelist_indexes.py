@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_order_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='item',
+            name='currency',
+            field=models.CharField(db_index=True, default='usd', help_text='USD, EUR, ...', max_length=3),
+        ),
+        migrations.AddIndex(
+            model_name='checkoutsession',
+            index=models.Index(fields=['created_at', 'id'], name='checkoutsession_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkoutsession',
+            index=models.Index(condition=models.Q(('paid', True)), fields=['created_at', 'id'], name='checkoutsession_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='checkoutsession',
+            index=models.Index(condition=models.Q(('paid', False)), fields=['created_at', 'id'], name='checkoutsession_unpaid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderpayment',
+            index=models.Index(fields=['created_at', 'id'], name='orderpayment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderpayment',
+            index=models.Index(condition=models.Q(('paid', True)), fields=['created_at', 'id'], name='orderpayment_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderpayment',
+            index=models.Index(condition=models.Q(('paid', False)), fields=['created_at', 'id'], name='orderpayment_unpaid_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discount',
+            name='stripe_coupon_ids',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='orderpayment',
+            name='group_parts',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Сколько частей в группе split-оплаты'),
+        ),
+        migrations.AddField(
+            model_name='tax',
+            name='stripe_tax_rate_ids',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_split_group_parts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkoutsession',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderpayment',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
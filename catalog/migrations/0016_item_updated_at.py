@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_payment_paid_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:01
+
+from django.db import migrations, models
+
+FIELDS = ("subtotal_cents", "discount_cents", "tax_cents", "total_cents")
+
+
+# уже записанным платежам суммы фиксируются по ценам на момент миграции, дальше они не плывут вслед за каталогом
+def backfill_amounts(apps, schema_editor):
+    from catalog.services.pricing import charged_amounts, item_charged_amounts, order_items, quote_order
+
+    CheckoutSession = apps.get_model("catalog", "CheckoutSession")
+    OrderPayment = apps.get_model("catalog", "OrderPayment")
+
+    def save(model, batch):
+        model.objects.bulk_update(batch, FIELDS, batch_size=500)
+        batch.clear()
+
+    batch = []
+    for cs in CheckoutSession.objects.filter(total_cents=None).select_related("item").iterator(chunk_size=2000):
+        for name, value in item_charged_amounts(cs.item).items():
+            setattr(cs, name, value)
+        batch.append(cs)
+        if len(batch) >= 2000:
+            save(CheckoutSession, batch)
+    save(CheckoutSession, batch)
+
+    payments = OrderPayment.objects.filter(total_cents=None).select_related("order", "order__discount") \
+        .prefetch_related("order__lines__item", "order__taxes")
+    for op in payments.iterator(chunk_size=2000):
+        items = order_items(op.order)
+        if op.currency:
+            items = [i for i in items if i.currency.lower() == op.currency]
+        for name, value in charged_amounts(quote_order(op.order, items=items)).items():
+            setattr(op, name, value)
+        batch.append(op)
+        if len(batch) >= 2000:
+            save(OrderPayment, batch)
+    save(OrderPayment, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_item_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkoutsession',
+            name='discount_cents',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='checkoutsession',
+            name='subtotal_cents',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='checkoutsession',
+            name='tax_cents',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='checkoutsession',
+            name='total_cents',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderpayment',
+            name='discount_cents',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderpayment',
+            name='subtotal_cents',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderpayment',
+            name='tax_cents',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='orderpayment',
+            name='total_cents',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_amounts, migrations.RunPython.noop),
+    ]
@@ -4,7 +4,10 @@ class Item(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     price = models.PositiveIntegerField(help_text="Цена в минимальных единицах")
-    currency = models.CharField(max_length=3, default='usd', help_text="USD, EUR, ...")
+    currency = models.CharField(max_length=3, default='usd', db_index=True, help_text="USD, EUR, ...")
+    stripe_product_id = models.CharField(max_length=64, blank=True, default="")
+    # quote-токен заказа с этим товаром, выданный раньше, уже не принимается (см. services.quotes)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         major = self.price / 100
@@ -21,6 +24,22 @@ class CheckoutSession(models.Model):
     session_id = models.CharField(max_length=255, unique=True)
     paid = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    paid_at = models.DateTimeField(null=True, blank=True)
+    # суммы, выставленные в Stripe при создании платежа; выгрузка и итоги выручки берут их, а не текущие цены
+    # (None — платёж записан до появления полей, тогда суммы пересчитываются)
+    subtotal_cents = models.PositiveIntegerField(null=True, blank=True)
+    discount_cents = models.PositiveIntegerField(null=True, blank=True)
+    tax_cents = models.PositiveIntegerField(null=True, blank=True)
+    total_cents = models.PositiveIntegerField(null=True, blank=True)
+
+    # индексы под changelist админки: сортировка/keyset по (created_at, id) и то же для фильтра paid —
+    # частичные индексы: SQLite сравнивает boolean без "= 1" (WHERE "paid"), составной (paid, ...) так не ищется
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="checkoutsession_created_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(paid=True), name="checkoutsession_paid_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(paid=False), name="checkoutsession_unpaid_idx"),
+        ]
 
     def __str__(self):
         status = "PAID" if self.paid else "UNPAID"
@@ -32,6 +51,8 @@ class Discount(models.Model):
     percent_off = models.PositiveIntegerField(help_text="Скидка в %")
     active = models.BooleanField(default=True)
     stripe_coupon_id = models.CharField(max_length=64, blank=True, default="")
+    # купоны в Stripe-аккаунтах других валют (split-оплата): {currency: coupon id}
+    stripe_coupon_ids = models.JSONField(blank=True, default=dict)
 
     def __str__(self):
         st = "ACTIVE" if self.active else "INACTIVE"
@@ -44,6 +65,8 @@ class Tax(models.Model):
     inclusive = models.BooleanField(default=False, help_text="Включён в цену (True) или сверху (False)")
     active = models.BooleanField(default=True)
     stripe_tax_rate_id = models.CharField(max_length=64, blank=True, default="")
+    # tax rates в Stripe-аккаунтах других валют (split-оплата): {currency: tax rate id}
+    stripe_tax_rate_ids = models.JSONField(blank=True, default=dict)
 
     def __str__(self):
         mode = "incl" if self.inclusive else "excl"
@@ -52,30 +75,132 @@ class Tax(models.Model):
 
 # корзина из нескольких товаров одной валюты
 class Order(models.Model):
-    items = models.ManyToManyField(Item, related_name="orders")
+    items = models.ManyToManyField(Item, related_name="orders", through="OrderItem")
     currency = models.CharField(max_length=3, default="usd")
     created_at = models.DateTimeField(auto_now_add=True)
     paid = models.BooleanField(default=False)
 
     discount = models.ForeignKey(Discount, null=True, blank=True, on_delete=models.SET_NULL, related_name="orders")
     taxes = models.ManyToManyField(Tax, blank=True, related_name="orders")
+    # растёт при изменении заказа, влияющем на сумму (см. signals), по нему проверяются quote-токены
+    # (изменения самих товаров проверяются по Item.updated_at)
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    # version меняют только сигналы (UPDATE ... version + 1): обычный save() его не пишет,
+    # иначе экземпляр, загруженный до изменения позиций или налогов, вернул бы старое значение
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get("force_insert") and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name != "version"
+            ]
+        super().save(*args, **kwargs)
 
     @property
     def total_amount(self) -> int:
-        return sum(i.price for i in self.items.all())
+        return sum(line.item.price * line.quantity for line in self.lines.select_related("item"))
 
     def __str__(self):
         return f"Order #{self.pk or 'new'}"
+
+# позиция заказа: товар и количество (таблица бывшей автоматической M2M Order.items)
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="lines")
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name="order_lines")
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        db_table = "catalog_order_items"
+        unique_together = [("order", "item")]
+
+    def __str__(self):
+        return f"{self.item_id} × {self.quantity}"
     
 # связка Stripe Checkout Session с Order
 # помогаем webhook найти нужный заказ
+# при оплате заказа со смешанными валютами на каждую валюту создаётся своя часть с общим group,
+# заказ становится PAID, когда оплачено group_parts частей группы
 class OrderPayment(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="payments")
-    session_id = models.CharField(max_length=255, unique=True)
+    session_id = models.CharField(max_length=255, unique=True, help_text="Checkout Session или PaymentIntent id")
     paid = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    paid_at = models.DateTimeField(null=True, blank=True)
+    currency = models.CharField(max_length=3, blank=True, default="", help_text="Валюта части (split-оплата)")
+    group = models.CharField(max_length=32, blank=True, default="", db_index=True,
+                             help_text="Общий id частей одной split-оплаты")
+    group_parts = models.PositiveSmallIntegerField(default=0, help_text="Сколько частей в группе split-оплаты")
+    # суммы, выставленные в Stripe при создании платежа; выгрузка и итоги выручки берут их, а не текущие цены
+    # (None — платёж записан до появления полей, тогда суммы пересчитываются)
+    subtotal_cents = models.PositiveIntegerField(null=True, blank=True)
+    discount_cents = models.PositiveIntegerField(null=True, blank=True)
+    tax_cents = models.PositiveIntegerField(null=True, blank=True)
+    total_cents = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="orderpayment_created_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(paid=True), name="orderpayment_paid_idx"),
+            models.Index(fields=["created_at", "id"], condition=models.Q(paid=False), name="orderpayment_unpaid_idx"),
+        ]
 
     def __str__(self):
         status = "PAID" if self.paid else "UNPAID"
         return f"{self.session_id} -> Order #{self.order_id} [{status}]"
 
+
+# профиль одного запроса (cProfile + SQL), сами файлы лежат в settings.PROFILING_DIR
+class RequestProfile(models.Model):
+    TRIGGER_CHOICES = [
+        ("staff", "Staff (?_profile=1)"),
+        ("token", "Signed header"),
+        ("sample", "Sampling"),
+    ]
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField(default=0)
+    trigger = models.CharField(max_length=16, choices=TRIGGER_CHOICES)
+    duration_ms = models.FloatField(default=0)
+    sql_count = models.PositiveIntegerField(default=0)
+    sql_ms = models.FloatField(default=0)
+    profile_file = models.CharField(max_length=255, help_text="Имя .prof файла в PROFILING_DIR")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+# компактный архив брошенных (неоплаченных) сессий, вынесенных из CheckoutSession / OrderPayment
+# без FK и unique-индексов, чтобы вставки в архив ничего не стоили
+class ArchivedSession(models.Model):
+    KIND_ITEM = 1
+    KIND_ORDER = 2
+    KIND_CHOICES = [(KIND_ITEM, "Item"), (KIND_ORDER, "Order")]
+
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    session_id = models.CharField(max_length=255)
+    object_id = models.PositiveBigIntegerField(help_text="Item.id или Order.id")
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.session_id} -> {self.get_kind_display()} #{self.object_id} [ARCHIVED]"
+
+# предагрегированная выручка за день по валюте (дашборд в админке)
+# обновляется инкрементально при оплате и пересобирается командой rebuild_revenue_rollup
+class DailyRevenue(models.Model):
+    day = models.DateField()
+    currency = models.CharField(max_length=3)
+    revenue_cents = models.BigIntegerField(default=0)
+    order_count = models.PositiveIntegerField(default=0, help_text="Оплаченные покупки Item и оплаты заказов")
+    discount_cents = models.BigIntegerField(default=0)
+    tax_cents = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "currency"], name="dailyrevenue_day_currency_uniq"),
+        ]
+        ordering = ["-day", "currency"]
+
+    def __str__(self):
+        return f"{self.day} {self.currency.upper()} {self.revenue_cents / 100:.2f}"
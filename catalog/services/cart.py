@@ -0,0 +1,198 @@
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import Discount, Item, Order, OrderItem, Tax
+from .pricing import quote
+
+# корзина в Django-сессии: строки {item_id: [цена, количество]} + накопленный subtotal
+# каждое изменение правит subtotal на разницу строки, итоги считаются services.pricing.quote
+# по subtotal, проценту скидки и налогам — стоимость не зависит от числа строк в корзине
+
+SESSION_KEY = "cart"
+
+
+# налоги корзины (settings.CART_TAX_IDS) — снимок на момент создания корзины
+def _tax_snapshot() -> list:
+    ids = getattr(settings, "CART_TAX_IDS", [])
+    if not ids:
+        return []
+    return [
+        [t.id, t.display_name, str(t.percentage), t.inclusive]
+        for t in Tax.objects.filter(id__in=ids, active=True).order_by("id")
+    ]
+def _describe_taxes(rows) -> list:
+    return [{"name": name, "rate": rate, "inclusive": inclusive} for _, name, rate, inclusive in rows]
+
+# цены строк, скидка или налоги изменились с момента добавления: корзина уже пересчитана по новым данным,
+# заказ не создан — покупатель должен подтвердить новые итоги повторным checkout
+# changes: {"discount": {"old_percent", "percent"}, "taxes": {"old", "new"}} — только то, что изменилось
+class PricesChanged(ValueError):
+    def __init__(self, lines: list, changes: dict | None = None):
+        super().__init__("Цены или скидки изменились, проверьте корзину и подтвердите заказ ещё раз")
+        self.lines = lines
+        self.changes = changes or {}
+
+
+class Cart:
+    def __init__(self, session):
+        self.session = session
+        data = session.get(SESSION_KEY)
+        if data is None:
+            data = {
+                "currency": "",
+                "lines": {},
+                "subtotal_cents": 0,
+                "count": 0,
+                "discount_id": None,
+                "discount_percent": 0,
+                "taxes": _tax_snapshot(),
+            }
+        self.data = data
+
+    def _save(self) -> None:
+        self.session[SESSION_KEY] = self.data
+        self.session.modified = True
+
+    def _change_line(self, item_id: int, price: int, quantity: int) -> None:
+        key = str(item_id)
+        old_price, old_quantity = self.data["lines"].get(key, (price, 0))
+        self.data["subtotal_cents"] += price * quantity - old_price * old_quantity
+        self.data["count"] += quantity - old_quantity
+        if quantity:
+            self.data["lines"][key] = [price, quantity]
+        else:
+            self.data["lines"].pop(key, None)
+        if not self.data["lines"]:
+            self.data["currency"] = ""
+        self._save()
+
+    def line(self, item_id: int) -> dict | None:
+        price, quantity = self.data["lines"].get(str(item_id), (None, 0))
+        if not quantity:
+            return None
+        return {"item_id": int(item_id), "price_cents": price, "quantity": quantity,
+                "line_total_cents": price * quantity}
+
+    # ---- изменения ----
+
+    def add(self, item: Item, quantity: int = 1) -> None:
+        if quantity <= 0:
+            raise ValueError("Количество должно быть больше нуля")
+        currency = (item.currency or "usd").lower()
+        if self.data["currency"] and self.data["currency"] != currency:
+            raise ValueError(
+                f"Корзина в {self.data['currency'].upper()}, товар в {currency.upper()}: оформите их отдельно"
+            )
+        self.data["currency"] = currency
+        current = self.data["lines"].get(str(item.id), (item.price, 0))[1]
+        self._change_line(item.id, int(item.price), current + quantity)
+
+    def set_quantity(self, item_id: int, quantity: int) -> None:
+        key = str(item_id)
+        if key not in self.data["lines"]:
+            raise ValueError("Товара нет в корзине")
+        if quantity < 0:
+            raise ValueError("Количество не может быть отрицательным")
+        self._change_line(item_id, self.data["lines"][key][0], quantity)
+
+    def remove(self, item_id: int) -> None:
+        if str(item_id) in self.data["lines"]:
+            self._change_line(item_id, self.data["lines"][str(item_id)][0], 0)
+
+    # скидка по названию (промокоду); пустой код снимает скидку
+    def apply_discount(self, code: str) -> None:
+        code = (code or "").strip()
+        if not code:
+            self.data["discount_id"], self.data["discount_percent"] = None, 0
+        else:
+            discount = Discount.objects.filter(name__iexact=code, active=True).first()
+            if discount is None:
+                raise ValueError("Промокод не найден")
+            self.data["discount_id"], self.data["discount_percent"] = discount.id, int(discount.percent_off)
+        self._save()
+
+    def clear(self) -> None:
+        self.session.pop(SESSION_KEY, None)
+        self.session.modified = True
+
+    # ---- итоги ----
+
+    def totals(self) -> dict:
+        taxes = [
+            SimpleNamespace(id=tax_id, display_name=name, percentage=rate, inclusive=inclusive)
+            for tax_id, name, rate, inclusive in self.data["taxes"]
+        ]
+        q = quote(self.data["subtotal_cents"], self.data["discount_percent"], taxes)
+        return {
+            "currency": self.data["currency"],
+            "count": self.data["count"],
+            "subtotal_cents": q["subtotal_cents"],
+            "discount_percent": q["discount_percent"],
+            "discount_cents": q["discount_cents"],
+            "taxes": [
+                {"name": line["tax"].display_name, "rate": line["tax"].percentage,
+                 "inclusive": line["tax"].inclusive, "amount_cents": line["amount_cents"]}
+                for line in q["taxes"]
+            ],
+            "tax_cents": q["tax_cents"],
+            "total_cents": q["total_cents"],
+        }
+
+    def lines(self) -> list:
+        return [self.line(item_id) for item_id in self.data["lines"]]
+
+    # ---- оформление ----
+
+    # скидка и налоги корзины по текущим данным; изменения (для PricesChanged) применяются к корзине
+    def _refresh_discount_and_taxes(self) -> dict:
+        changes = {}
+        percent = 0
+        if self.data["discount_id"]:
+            discount = Discount.objects.filter(id=self.data["discount_id"], active=True).first()
+            percent = int(discount.percent_off) if discount else 0
+            if discount is None:
+                self.data["discount_id"] = None
+        if percent != self.data["discount_percent"]:
+            changes["discount"] = {"old_percent": self.data["discount_percent"], "percent": percent}
+            self.data["discount_percent"] = percent
+
+        taxes = _tax_snapshot()
+        if taxes != self.data["taxes"]:
+            changes["taxes"] = {"old": _describe_taxes(self.data["taxes"]), "new": _describe_taxes(taxes)}
+            self.data["taxes"] = taxes
+        if changes:
+            self._save()
+        return changes
+
+    # корзина -> Order: цены сверяются с каталогом одним запросом, позиции пишутся одним bulk_create
+    # если изменились цены, скидка или налоги — корзина обновляется и поднимается PricesChanged
+    def checkout(self) -> Order:
+        if not self.data["lines"]:
+            raise ValueError("Корзина пуста")
+        items = Item.objects.in_bulk([int(k) for k in self.data["lines"]])
+        missing = [k for k in self.data["lines"] if int(k) not in items]
+        if missing:
+            for key in missing:
+                self.remove(int(key))
+            raise ValueError("Некоторые товары больше недоступны и удалены из корзины")
+        changed = []
+        for key, (price, quantity) in list(self.data["lines"].items()):
+            if int(items[int(key)].price) != price:
+                self._change_line(int(key), int(items[int(key)].price), quantity)
+                changed.append({**self.line(int(key)), "old_price_cents": price})
+        changes = self._refresh_discount_and_taxes()
+        if changed or changes:
+            raise PricesChanged(changed, changes)
+
+        with transaction.atomic():
+            order = Order.objects.create(currency=self.data["currency"], discount_id=self.data["discount_id"])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, item_id=int(key), quantity=quantity)
+                for key, (_, quantity) in self.data["lines"].items()
+            ])
+            if self.data["taxes"]:
+                order.taxes.set([tax_id for tax_id, *_ in self.data["taxes"]])
+        self.clear()
+        return order
@@ -0,0 +1,61 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+# параллельные вызовы Stripe в ограниченном пуле потоков
+# fn не должна ходить в БД: у каждого потока было бы своё соединение, которое никто не закроет
+
+# запускает fn(obj) для всех объектов в ограниченном пуле потоков
+# возвращает [(obj, None)] при успехе или [(obj, exception)] при ошибке, порядок как у objects
+def run_concurrently(fn, objects, max_workers: int | None = None) -> list:
+    objects = list(objects)
+    if not objects:
+        return []
+    workers = max_workers or getattr(settings, "STRIPE_SYNC_CONCURRENCY", 10)
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(objects))) as pool:
+        futures = {pool.submit(fn, obj): idx for idx, obj in enumerate(objects)}
+        for future in as_completed(futures):
+            idx = futures[future]
+            results[idx] = (objects[idx], future.exception())
+    return [results[i] for i in range(len(objects))]
+
+_background_pool = None
+_background_lock = threading.Lock()
+
+# фоновый вызов Stripe на время обработки запроса (общий пул процесса); fn тоже не должна ходить в БД
+def submit_background(fn, *args) -> Future:
+    global _background_pool
+    if _background_pool is None:
+        with _background_lock:
+            if _background_pool is None:
+                _background_pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "STRIPE_SYNC_CONCURRENCY", 10), thread_name_prefix="stripe-bg",
+                )
+    return _background_pool.submit(fn, *args)
+
+# ограничение частоты запросов (token bucket) отдельно для каждого ключа — у нас это Stripe-аккаунт (secret key)
+# acquire(key) блокирует поток, пока у аккаунта не появится свободный токен; rate <= 0 — без ограничения
+class RateLimiter:
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(key, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[key] = (tokens - 1, now)
+                    return
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
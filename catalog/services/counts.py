@@ -0,0 +1,43 @@
+import json
+
+from django.conf import settings
+from django.db import connections
+
+EXACT = "exact"
+ESTIMATE = "estimate"
+AT_LEAST = "at_least"
+
+
+# число строк queryset без полного COUNT(*) по таблице на десятки миллионов строк
+# точный COUNT читает не больше ADMIN_EXACT_COUNT_LIMIT строк (подзапрос с LIMIT), сверх порога — оценка:
+#   Postgres — Plan Rows из EXPLAIN (статистика ANALYZE, для таблицы без фильтров это pg_class.reltuples)
+#   остальные БД — MAX(id) для таблицы без фильтров, для отфильтрованной выборки только нижняя граница
+# возвращает (count, kind): kind — EXACT, ESTIMATE или AT_LEAST
+def estimated_count(queryset, exact_limit: int | None = None) -> tuple:
+    if exact_limit is None:
+        exact_limit = getattr(settings, "ADMIN_EXACT_COUNT_LIMIT", 10_000)
+    connection = connections[queryset.db]
+    queryset = queryset.order_by()
+
+    if connection.vendor == "postgresql":
+        planned = _planned_rows(queryset, connection)
+        if planned > exact_limit:
+            return planned, ESTIMATE
+
+    count = queryset[:exact_limit + 1].count()
+    if count <= exact_limit:
+        return count, EXACT
+    if not queryset.query.where:
+        last_id = queryset.order_by("-pk").values_list("pk", flat=True).first()
+        return max(last_id or 0, exact_limit), ESTIMATE
+    return exact_limit, AT_LEAST
+
+
+def _planned_rows(queryset, connection) -> int:
+    sql, params = queryset.values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,136 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ..models import CheckoutSession, OrderPayment
+from .pricing import CHARGED_FIELDS, charged_amounts, item_charged_amounts
+from .pricing import order_items, quote_order, with_pricing_data
+
+# потоковая выгрузка платежей для бухгалтерии (CSV / NDJSON)
+# строки читаются .iterator(chunk_size=...), поэтому память не растёт с объёмом выгрузки
+
+COLUMNS = [
+    "kind", "session_id", "created_at", "paid", "currency", "object_id", "items",
+    "subtotal_cents", "discount_cents", "tax_cents", "total_cents",
+]
+
+
+# дата YYYY-MM-DD из параметра; None — формат неверный или такой даты нет (2025-02-30:
+# parse_date на ней не возвращает None, а поднимает ValueError)
+def parse_day(raw: str):
+    try:
+        return parse_date(raw)
+    except ValueError:
+        return None
+
+# границы периода [since, until] (даты включительно) в aware datetime
+def _date_range_filter(field: str, since=None, until=None) -> dict:
+    flt = {}
+    tz = timezone.get_current_timezone()
+    if since:
+        flt[f"{field}__gte"] = timezone.make_aware(datetime.combine(since, time.min), tz)
+    if until:
+        flt[f"{field}__lt"] = timezone.make_aware(datetime.combine(until + timedelta(days=1), time.min), tz)
+    return flt
+
+# суммы, записанные при создании платежа; None — старая запись, суммы считаются по текущим данным
+def _stored_amounts(obj) -> dict | None:
+    if obj.total_cents is None:
+        return None
+    return {name: getattr(obj, name) for name in CHARGED_FIELDS}
+
+# строка выгрузки для покупки одного Item
+def item_payment_row(cs) -> dict:
+    amounts = _stored_amounts(cs) or item_charged_amounts(cs.item)
+    return {
+        "kind": "item",
+        "session_id": cs.session_id,
+        "created_at": cs.created_at.isoformat(),
+        "paid": cs.paid,
+        "currency": cs.item.currency.lower(),
+        "object_id": cs.item_id,
+        "items": cs.item.name,
+        **amounts,
+    }
+
+# строка выгрузки для оплаты заказа; часть split-оплаты считается только по товарам своей валюты
+def order_payment_row(op) -> dict:
+    order = op.order
+    items = order_items(order)
+    if op.currency:
+        items = [i for i in items if i.currency.lower() == op.currency]
+    amounts = _stored_amounts(op) or charged_amounts(quote_order(order, items=items))
+    return {
+        "kind": "order",
+        "session_id": op.session_id,
+        "created_at": op.created_at.isoformat(),
+        "paid": op.paid,
+        "currency": (op.currency or order.currency).lower(),
+        "object_id": op.order_id,
+        "items": "; ".join(i.name if i.quantity == 1 else f"{i.name} × {i.quantity}" for i in items),
+        **amounts,
+    }
+
+# пары (CheckoutSession | OrderPayment, строка выгрузки); paid: True/False или None (все)
+# by_paid_at: период по дате оплаты (у оплат без paid_at — по created_at), иначе по дате создания сессии
+def iter_payments(since=None, until=None, currency: str | None = None, paid: bool | None = True,
+                  chunk_size: int = 2000, by_paid_at: bool = False):
+    date_field = "paid_or_created_at" if by_paid_at else "created_at"
+    flt = _date_range_filter(date_field, since, until)
+    if paid is not None:
+        flt["paid"] = paid
+
+    def scoped(model):
+        qs = model.objects.all()
+        if by_paid_at:
+            qs = qs.annotate(paid_or_created_at=Coalesce("paid_at", "created_at"))
+        return qs.filter(**flt)
+
+    items_qs = scoped(CheckoutSession).select_related("item").order_by("id")
+    if currency:
+        items_qs = items_qs.filter(item__currency__iexact=currency)
+    for cs in items_qs.iterator(chunk_size=chunk_size):
+        yield cs, item_payment_row(cs)
+
+    # items/taxes/discount заказов подгружаются пачкой на каждый chunk
+    orders_qs = with_pricing_data(scoped(OrderPayment), prefix="order__") \
+        .select_related("order").order_by("id")
+    if currency:
+        orders_qs = orders_qs.filter(
+            Q(currency__iexact=currency) | Q(currency="", order__currency__iexact=currency)
+        )
+    for op in orders_qs.iterator(chunk_size=chunk_size):
+        yield op, order_payment_row(op)
+
+def iter_payment_rows(since=None, until=None, currency: str | None = None, paid: bool | None = True,
+                      chunk_size: int = 2000):
+    for _, row in iter_payments(since, until, currency, paid, chunk_size):
+        yield row
+
+
+# csv.writer пишет в этот "буфер" и сразу отдаёт строку наружу
+class _Echo:
+    def write(self, value):
+        return value
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow([row[c] for c in COLUMNS])
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+PAID_CHOICES = {"paid": True, "unpaid": False, "all": None}
+
+FORMATS = {
+    "csv": (stream_csv, "text/csv; charset=utf-8"),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
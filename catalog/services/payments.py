@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from ..models import CheckoutSession, Order, OrderPayment
+from .revenue import record_paid
+
+# учёт оплаты заказов: обычная оплата закрывает заказ сразу,
+# split-оплата (части с общим group) — только когда оплачены все части
+
+
+# группы split-оплаты, в которых оплачено group_parts частей
+# неоплаченную часть могли удалить (архив), поэтому отсутствие строк paid=False ещё ничего не значит
+# (у групп, записанных до появления group_parts, ожидаем все строки группы)
+def closed_groups(groups) -> set:
+    groups = {g for g in groups if g}
+    if not groups:
+        return set()
+    rows = (
+        OrderPayment.objects.filter(group__in=groups).values("group")
+        .annotate(total=Count("id"), paid_count=Count("id", filter=Q(paid=True)), parts=Max("group_parts"))
+    )
+    return {r["group"] for r in rows if r["paid_count"] >= (r["parts"] or r["total"])}
+
+# id заказов, которые полностью оплачены после того, как payments отмечены paid
+def fully_paid_order_ids(payments) -> set:
+    closed = closed_groups(op.group for op in payments)
+    return {op.order_id for op in payments if op.paid and (not op.group or op.group in closed)}
+
+# отмечает OrderPayment (Checkout Session или PaymentIntent) оплаченным
+# возвращает (payment, order_paid) или (None, False), если такой оплаты у нас нет
+def mark_order_payment_paid(session_id: str) -> tuple:
+    with transaction.atomic():
+        op = OrderPayment.objects.select_for_update().select_related("order").filter(session_id=session_id).first()
+        if op is None:
+            return None, False
+        if not op.paid:
+            op.paid = True
+            op.paid_at = timezone.now()
+            op.save(update_fields=["paid", "paid_at"])
+            record_paid(OrderPayment, [op.id])
+
+        order_paid = op.order_id in fully_paid_order_ids([op])
+        if order_paid and not op.order.paid:
+            Order.objects.filter(id=op.order_id).update(paid=True)
+            op.order.paid = True
+        return op, order_paid
+
+# отмечает покупку Item оплаченной; True, если статус изменился именно сейчас
+# условный UPDATE защищает итоги выручки от повторной доставки webhook
+def mark_checkout_session_paid(session_id: str) -> bool:
+    with transaction.atomic():
+        cs_id = CheckoutSession.objects.filter(session_id=session_id).values_list("id", flat=True).first()
+        if cs_id is None or not CheckoutSession.objects.filter(id=cs_id, paid=False).update(paid=True, paid_at=timezone.now()):
+            return False
+        record_paid(CheckoutSession, [cs_id])
+        return True
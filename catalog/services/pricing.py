@@ -0,0 +1,80 @@
+import copy
+from decimal import ROUND_HALF_UP, Decimal
+
+# единые правила расчёта заказа (страницы /order/, /order-intent/, PaymentIntent, выгрузки):
+# скидка заказа уменьшает налоговую базу, inclusive-налог выделяется из суммы, exclusive начисляется сверху
+
+CHARGED_FIELDS = ("subtotal_cents", "discount_cents", "tax_cents", "total_cents")
+
+
+def _round_cents(value: Decimal) -> int:
+    return int(value.quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+# процент активной скидки заказа (0, если скидки нет или она выключена)
+def order_discount_percent(order) -> int:
+    d = getattr(order, "discount", None)
+    return int(d.percent_off) if (d and d.active) else 0
+
+# расчёт по готовому subtotal; taxes — активные Tax
+def quote(subtotal_cents: int, percent_off: int, taxes) -> dict:
+    discount_cents = _round_cents(Decimal(subtotal_cents) * Decimal(percent_off) / Decimal(100))
+    taxable_base_cents = subtotal_cents - discount_cents
+
+    tax_lines = []
+    exclusive_total_cents = 0
+    for t in taxes:
+        rate = Decimal(t.percentage)
+        if t.inclusive:
+            # из суммы выделяем налоговую часть
+            amount = _round_cents(Decimal(taxable_base_cents) * rate / (Decimal(100) + rate))
+        else:
+            # начисляемый сверху налог
+            amount = _round_cents(Decimal(taxable_base_cents) * rate / Decimal(100))
+            exclusive_total_cents += amount
+        tax_lines.append({"tax": t, "amount_cents": amount})
+
+    return {
+        "subtotal_cents": subtotal_cents,
+        "discount_percent": percent_off,
+        "discount_cents": discount_cents,
+        "taxes": tax_lines,
+        "tax_cents": sum(line["amount_cents"] for line in tax_lines),
+        "total_cents": taxable_base_cents + exclusive_total_cents,
+    }
+
+# позиции заказа: Item с атрибутом quantity (копии, т.к. prefetch отдаёт один Item на несколько заказов)
+# цены всегда из БД, не из снимка каталога: по ним выставляется сумма в Stripe и подписывается quote-токен
+def order_items(order) -> list:
+    lines = order.lines.all()
+    if "lines" not in getattr(order, "_prefetched_objects_cache", {}):
+        lines = lines.select_related("item")
+    items = []
+    for line in lines:
+        item = copy.copy(line.item)
+        item.quantity = line.quantity
+        items.append(item)
+    return items
+
+# суммы расчёта, которые записываются в CheckoutSession/OrderPayment при создании платежа
+def charged_amounts(q) -> dict:
+    return {name: max(0, int(q[name])) for name in CHARGED_FIELDS}
+
+# суммы покупки одного товара (без скидки и налогов)
+def item_charged_amounts(item) -> dict:
+    return charged_amounts(quote(int(item.price), 0, []))
+
+# стоимость позиций; у Item без quantity (покупка одного товара) количество 1
+def items_subtotal_cents(items) -> int:
+    return sum(int(i.price) * getattr(i, "quantity", 1) for i in items)
+
+# расчёт заказа; items (order_items) и taxes можно передать заранее загруженными
+# при with_pricing_data расчёт не делает ни одного запроса
+def quote_order(order, items=None) -> dict:
+    if items is None:
+        items = order_items(order)
+    taxes = [t for t in order.taxes.all() if t.active]
+    return quote(items_subtotal_cents(items), order_discount_percent(order), taxes)
+
+# queryset заказов с предзагрузкой всего, что нужно quote_order
+def with_pricing_data(queryset, prefix: str = ""):
+    return queryset.select_related(f"{prefix}discount").prefetch_related(f"{prefix}lines__item", f"{prefix}taxes")
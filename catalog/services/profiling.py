@@ -0,0 +1,126 @@
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import connections
+
+from ..models import RequestProfile
+
+PROFILE_TOKEN_SALT = "catalog.profiling"
+
+# cProfile нельзя включить дважды одновременно (Python 3.12+), профилируем по одному запросу
+_profiler_lock = threading.Lock()
+
+
+def _profiles_dir() -> Path:
+    path = Path(getattr(settings, "PROFILING_DIR", settings.BASE_DIR / "profiles"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+# подписанный токен для заголовка X-Profile-Token (curl, внешние клиенты)
+# привязан к пользователю (запрос должен идти с его сессией) и одноразовый: nonce гасится в кеше
+def make_profile_token(user) -> str:
+    return signing.dumps({"user": user.pk, "nonce": uuid.uuid4().hex}, salt=PROFILE_TOKEN_SALT)
+
+def is_valid_profile_token(token: str, user) -> bool:
+    if user is None or not user.is_authenticated or not user.is_active:
+        return False
+    max_age = getattr(settings, "PROFILING_TOKEN_MAX_AGE", 3600)
+    try:
+        data = signing.loads(token, salt=PROFILE_TOKEN_SALT, max_age=max_age)
+    except signing.BadSignature:
+        return False
+    if not isinstance(data, dict) or data.get("user") != user.pk or not data.get("nonce"):
+        return False
+    return cache.add(f"profile-token:{data['nonce']}", 1, timeout=max_age)
+
+# выполняет запрос под cProfile и собирает все SQL-запросы с таймингами
+def profile_request(request, get_response, trigger: str):
+    if not _profiler_lock.acquire(blocking=False):
+        # уже профилируется другой запрос — обслуживаем без профиля
+        return get_response(request)
+
+    queries = []
+
+    def record_sql(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            queries.append({
+                "sql": sql,
+                "params": repr(params)[:500],
+                "many": many,
+                "ms": round((time.perf_counter() - start) * 1000, 3),
+            })
+
+    profiler = cProfile.Profile()
+    try:
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(record_sql))
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+    finally:
+        _profiler_lock.release()
+
+    record = _save_profile(request, response, trigger, profiler, queries, duration_ms)
+    response["X-Profile-Id"] = str(record.pk)
+    return response
+
+def _save_profile(request, response, trigger, profiler, queries, duration_ms) -> RequestProfile:
+    base = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    directory = _profiles_dir()
+    profiler.dump_stats(directory / f"{base}.prof")
+    (directory / f"{base}.sql.json").write_text(json.dumps(queries, ensure_ascii=False))
+
+    return RequestProfile.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:500],
+        status_code=getattr(response, "status_code", 0),
+        trigger=trigger,
+        duration_ms=round(duration_ms, 3),
+        sql_count=len(queries),
+        sql_ms=round(sum(q["ms"] for q in queries), 3),
+        profile_file=f"{base}.prof",
+    )
+
+def profile_path(record: RequestProfile) -> Path:
+    return _profiles_dir() / record.profile_file
+
+def sql_path(record: RequestProfile) -> Path:
+    return _profiles_dir() / record.profile_file.replace(".prof", ".sql.json")
+
+# текстовый отчёт pstats для админки
+def render_stats(record: RequestProfile, sort: str = "cumulative", limit: int = 60) -> str:
+    path = profile_path(record)
+    if not path.exists():
+        return f"Файл профиля не найден: {path}"
+    out = io.StringIO()
+    stats = pstats.Stats(str(path), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+def load_queries(record: RequestProfile) -> list:
+    path = sql_path(record)
+    if not path.exists():
+        return []
+    return json.loads(path.read_text())
+
+def delete_files(record: RequestProfile) -> None:
+    for path in (profile_path(record), sql_path(record)):
+        path.unlink(missing_ok=True)
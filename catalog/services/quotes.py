@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core import signing
+from django.utils.dateparse import parse_datetime
+
+from .pricing import charged_amounts
+
+# подписанный расчёт заказа: страница заказа считает сумму и отдаёт токен,
+# buy-эндпоинты по нему не пересчитывают заказ, пока не изменились его версия и товары
+# (в токене — самый поздний Item.updated_at позиций, по которым считалась сумма)
+
+QUOTE_TOKEN_SALT = "catalog.quote"
+
+
+# q — расчёт quote_order: в токене итог и его составляющие (их запишет платёж, см. pricing.charged_amounts)
+def make_quote_token(order, currency: str, q: dict, items) -> str:
+    updated = max((i.updated_at for i in items), default=None)
+    amounts = charged_amounts(q)
+    return signing.dumps(
+        {"o": order.id, "v": order.version, "a": amounts["total_cents"], "c": currency.lower(),
+         "s": amounts["subtotal_cents"], "d": amounts["discount_cents"], "t": amounts["tax_cents"],
+         "u": updated.isoformat() if updated else ""},
+        salt=QUOTE_TOKEN_SALT, compress=True,
+    )
+
+# {"amount", "currency", "amounts"} из токена, если он подписан нами, не истёк, выдан для этого заказа
+# и заказ с тех пор не менялся и не оплачен; иначе None — вызывающий считает заказ заново
+# order уже загружен view (один запрос по первичному ключу), позиции/скидка/налоги не нужны —
+# только EXISTS по позициям, чьи товары менялись после расчёта
+def verified_quote(token: str | None, order) -> dict | None:
+    if not token or order.paid:
+        return None
+    max_age = getattr(settings, "QUOTE_TOKEN_MAX_AGE", 900)
+    try:
+        data = signing.loads(token, salt=QUOTE_TOKEN_SALT, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    if not isinstance(data, dict) or data.get("o") != order.id or data.get("v") != order.version:
+        return None
+    if not all(key in data for key in ("s", "d", "t")):
+        return None
+    updated = parse_datetime(data.get("u") or "")
+    if updated is None or order.lines.filter(item__updated_at__gt=updated).exists():
+        return None
+    return {
+        "amount": data["a"],
+        "currency": data["c"],
+        "amounts": {"subtotal_cents": data["s"], "discount_cents": data["d"], "tax_cents": data["t"],
+                    "total_cents": data["a"]},
+    }
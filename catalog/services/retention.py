@@ -0,0 +1,105 @@
+import gzip
+import json
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from ..models import ArchivedSession, CheckoutSession, OrderPayment
+
+# какие таблицы чистим: модель, вид в архиве, имя FK-колонки
+SOURCES = {
+    "item": (CheckoutSession, ArchivedSession.KIND_ITEM, "item_id"),
+    "order": (OrderPayment, ArchivedSession.KIND_ORDER, "order_id"),
+}
+
+
+# архив в таблицу ArchivedSession
+class TableSink:
+    def write(self, kind: int, rows) -> None:
+        ArchivedSession.objects.bulk_create([
+            ArchivedSession(kind=kind, session_id=session_id, object_id=object_id, created_at=created_at)
+            for _, session_id, object_id, created_at in rows
+        ])
+
+    def close(self) -> None:
+        pass
+
+
+# архив в сжатый NDJSON (одна сессия на строку)
+class NDJSONSink:
+    def __init__(self, path):
+        self.path = path
+        self.fh = gzip.open(path, "at", encoding="utf-8")
+
+    def write(self, kind: int, rows) -> None:
+        for _, session_id, object_id, created_at in rows:
+            self.fh.write(json.dumps({
+                "kind": kind,
+                "session_id": session_id,
+                "object_id": object_id,
+                "created_at": created_at.isoformat(),
+            }) + "\n")
+        self.fh.flush()
+
+    def close(self) -> None:
+        self.fh.close()
+
+
+# выносит неоплаченные сессии старше older_than в архив маленькими транзакциями
+# каждая транзакция блокирует только свой чанк (на Postgres — с SKIP LOCKED), поэтому
+# параллельные вставки и webhook не ждут завершения всей чистки
+# отдаёт статистику после каждого чанка: {"source", "rows", "total", "rows_per_sec"}
+def archive_unpaid(source: str, older_than: timedelta, sink, chunk_size: int = 500, pause: float = 0.0):
+    model, kind, fk = SOURCES[source]
+    cutoff = timezone.now() - older_than
+    base = model.objects.filter(paid=False, created_at__lt=cutoff).order_by("id")
+    if model is OrderPayment:
+        # части split-оплаты уходят в архив, только если в группе нет ни одной оплаченной части
+        base = base.exclude(Exists(
+            OrderPayment.objects.filter(group=OuterRef("group"), paid=True).exclude(group="")
+        ))
+
+    last_id = 0
+    total = 0
+    started = time.perf_counter()
+    while True:
+        with transaction.atomic():
+            qs = base.filter(id__gt=last_id)
+            if connection.features.has_select_for_update_skip_locked:
+                qs = qs.select_for_update(skip_locked=True)
+            rows = list(qs.values_list("id", "session_id", fk, "created_at")[:chunk_size])
+            if not rows:
+                break
+            sink.write(kind, rows)
+            model.objects.filter(id__in=[r[0] for r in rows]).delete()
+
+        last_id = rows[-1][0]
+        total += len(rows)
+        elapsed = time.perf_counter() - started
+        yield {
+            "source": source,
+            "rows": len(rows),
+            "total": total,
+            "rows_per_sec": total / elapsed if elapsed else 0.0,
+        }
+        if pause:
+            time.sleep(pause)
+
+# checkout.session.expired: переносим конкретную неоплаченную сессию в архив сразу
+# части split-оплаты (OrderPayment с group) не трогаем: по ним группа проверяет, все ли части оплачены
+def archive_expired_session(session_id: str) -> int:
+    archived = 0
+    with transaction.atomic():
+        for model, kind, fk in SOURCES.values():
+            qs = model.objects.select_for_update().filter(session_id=session_id, paid=False)
+            if model is OrderPayment:
+                qs = qs.filter(group="")
+            rows = list(qs.values_list("id", "session_id", fk, "created_at"))
+            if rows:
+                TableSink().write(kind, rows)
+                model.objects.filter(id__in=[r[0] for r in rows]).delete()
+                archived += len(rows)
+    return archived
@@ -0,0 +1,96 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import CheckoutSession, DailyRevenue, OrderPayment
+from .export import item_payment_row, iter_payments, order_payment_row
+from .pricing import with_pricing_data
+
+# дневные итоги выручки по валютам (DailyRevenue)
+# день — локальная дата оплаты (paid_at; у оплат, записанных до его появления, — created_at),
+# суммы — те же, что в выгрузке платежей
+# части split-оплаты добавляют выручку каждая в свою валюту, а в order_count заказ попадает один раз —
+# на части, которая закрыла группу (последняя оплаченная по (paid_at, id))
+
+FIELDS = ("revenue_cents", "order_count", "discount_cents", "tax_cents")
+
+
+def _day(obj):
+    return timezone.localdate(obj.paid_at or obj.created_at)
+
+def _add(totals, obj, row, count: int = 1) -> None:
+    t = totals[(_day(obj), row["currency"])]
+    t["revenue_cents"] += row["total_cents"]
+    t["order_count"] += count
+    t["discount_cents"] += row["discount_cents"]
+    t["tax_cents"] += row["tax_cents"]
+
+# id частей, закрывших свои группы (только среди полностью оплаченных групп)
+def _group_closers(groups) -> set:
+    from .payments import closed_groups
+
+    last = {}
+    rows = OrderPayment.objects.filter(group__in=closed_groups(groups), paid=True) \
+        .values_list("group", "paid_at", "created_at", "id")
+    for group, paid_at, created_at, pk in rows:
+        key = (paid_at or created_at, pk)
+        if group not in last or key > last[group]:
+            last[group] = key
+    return {pk for _, pk in last.values()}
+
+def _empty_totals():
+    return defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+
+# прибавляет к итогам только что оплаченные CheckoutSession / OrderPayment
+# вызывать в той же транзакции, где paid переключается False -> True (ровно один раз на оплату)
+def record_paid(model, ids) -> None:
+    ids = list(ids)
+    if not ids:
+        return
+    totals = _empty_totals()
+    if model is CheckoutSession:
+        for cs in CheckoutSession.objects.filter(id__in=ids).select_related("item"):
+            _add(totals, cs, item_payment_row(cs))
+    else:
+        payments = list(
+            with_pricing_data(OrderPayment.objects.filter(id__in=ids), prefix="order__").select_related("order")
+        )
+        closers = _group_closers({op.group for op in payments if op.group})
+        for op in payments:
+            _add(totals, op, order_payment_row(op), count=int(not op.group or op.id in closers))
+
+    # строки берём в порядке ключа, чтобы параллельные webhook не блокировали друг друга крест-накрест
+    for (day, currency), t in sorted(totals.items()):
+        DailyRevenue.objects.get_or_create(day=day, currency=currency)
+        DailyRevenue.objects.filter(day=day, currency=currency).update(
+            **{name: F(name) + value for name, value in t.items()}
+        )
+
+# пересчитывает итоги за период [since, until] (или за всё время) по оплатам, прошедшим в этот период
+# чтение идёт потоком, в памяти — итоги по (день, валюта) и ключи частей split-оплаты
+def rebuild(since=None, until=None, chunk_size: int = 2000) -> int:
+    totals = _empty_totals()
+    grouped = {}
+    for obj, row in iter_payments(since, until, paid=True, chunk_size=chunk_size, by_paid_at=True):
+        if getattr(obj, "group", ""):
+            grouped[obj.id] = (obj.group, (_day(obj), row["currency"]))
+            _add(totals, obj, row, count=0)
+        else:
+            _add(totals, obj, row)
+    for pk in _group_closers({group for group, _ in grouped.values()}) & grouped.keys():
+        totals[grouped[pk][1]]["order_count"] += 1
+
+    with transaction.atomic():
+        stale = DailyRevenue.objects.all()
+        if since:
+            stale = stale.filter(day__gte=since)
+        if until:
+            stale = stale.filter(day__lte=until)
+        stale.delete()
+        DailyRevenue.objects.bulk_create(
+            [DailyRevenue(day=day, currency=currency, **t) for (day, currency), t in totals.items()],
+            batch_size=500,
+        )
+    return len(totals)
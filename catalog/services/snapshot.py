@@ -0,0 +1,214 @@
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from ..models import Item
+
+# read-only снимок каталога (Item) в файле, который все воркеры отображают через mmap:
+# страницы файла лежат в page cache один раз, сколько бы процессов его ни читало
+#
+# формат (порядок байт нативный — снимок собирается и читается на одном хосте):
+#   заголовок: magic, version (time_ns сборки), count
+#   ids       int64[count]            — по возрастанию, поиск bisect
+#   prices    int64[count]
+#   offsets   uint64[count * 3 + 1]   — границы строк name/description/stripe_product_id в blob
+#   currency  4s[count]               — ascii, дополнено нулями
+#   blob      utf-8
+# файл собирается рядом во временный и подменяется os.replace, читатели замечают новый inode/mtime
+#
+# снимок — только для показа и поиска товаров: он может отставать от БД (update(), bulk-операции,
+# изменения с другого хоста), поэтому суммы к оплате считаются по БД
+
+MAGIC = b"CATSNAP1"
+HEADER = struct.Struct("=8sQI4x")
+STRINGS = ("name", "description", "stripe_product_id")
+FIELDS = ("id", *STRINGS, "price", "currency")
+
+log = logging.getLogger(__name__)
+
+
+def snapshot_path() -> Path | None:
+    path = getattr(settings, "CATALOG_SNAPSHOT_PATH", None)
+    return Path(path) if path else None
+
+
+class CatalogSnapshot:
+    def __init__(self, path: Path):
+        with open(path, "rb") as fh:
+            st = os.fstat(fh.fileno())
+            self.key = (st.st_ino, st.st_mtime_ns, st.st_size)
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.version, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: не снимок каталога")
+        view = memoryview(self._mm)
+        pos = HEADER.size
+        self.ids = view[pos:pos + 8 * count].cast("q")
+        pos += 8 * count
+        self.prices = view[pos:pos + 8 * count].cast("q")
+        pos += 8 * count
+        self.offsets = view[pos:pos + 8 * (count * len(STRINGS) + 1)].cast("Q")
+        pos += 8 * (count * len(STRINGS) + 1)
+        self.currencies = view[pos:pos + 4 * count]
+        pos += 4 * count
+        self.blob = view[pos:]
+        # from_db ждёт значения в порядке полей модели
+        self._names = [f.attname for f in Item._meta.concrete_fields if f.attname in FIELDS]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _index(self, item_id: int) -> int | None:
+        idx = bisect_left(self.ids, item_id)
+        if idx < len(self.ids) and self.ids[idx] == item_id:
+            return idx
+        return None
+
+    def _string(self, idx: int, n: int) -> str:
+        k = idx * len(STRINGS) + n
+        return str(self.blob[self.offsets[k]:self.offsets[k + 1]], "utf-8")
+
+    # Item, как будто загруженный из БД (поля, которых нет в снимке, догрузятся из БД при обращении)
+    def get(self, item_id: int) -> Item | None:
+        idx = self._index(int(item_id))
+        if idx is None:
+            return None
+        values = {
+            "id": self.ids[idx],
+            "price": self.prices[idx],
+            "currency": bytes(self.currencies[idx * 4:idx * 4 + 4]).rstrip(b"\0").decode("ascii"),
+        }
+        for n, name in enumerate(STRINGS):
+            values[name] = self._string(idx, n)
+        return Item.from_db("default", self._names, [values[name] for name in self._names])
+
+
+_current = None
+_lock = threading.Lock()
+
+# актуальный снимок процесса; None — снимок выключен или ещё не собран
+# os.stat на каждый вызов стоит единицы микросекунд и позволяет подхватить новый файл без рестарта
+def current() -> CatalogSnapshot | None:
+    global _current
+    path = snapshot_path()
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    snap = _current
+    if snap is not None and snap.key == (st.st_ino, st.st_mtime_ns, st.st_size):
+        return snap
+    with _lock:
+        if _current is None or _current.key != (st.st_ino, st.st_mtime_ns, st.st_size):
+            # старый mmap закроется сам, когда его перестанут использовать
+            _current = CatalogSnapshot(path)
+        return _current
+
+# Item по id: из снимка, если он есть, иначе из БД
+def get_item(item_id: int) -> Item | None:
+    snap = current()
+    if snap is not None:
+        item = snap.get(item_id)
+        if item is not None:
+            return item
+    return Item.objects.filter(id=item_id).first()
+
+# {id: Item}; чего нет в снимке (новые товары до пересборки) — одним запросом из БД
+def get_items(ids) -> dict:
+    ids = set(ids)
+    found = {}
+    snap = current()
+    if snap is not None:
+        for item_id in ids:
+            item = snap.get(item_id)
+            if item is not None:
+                found[item_id] = item
+    missing = ids - found.keys()
+    if missing:
+        found.update(Item.objects.in_bulk(missing))
+    return found
+
+
+# собирает снимок из БД и атомарно подменяет файл; возвращает (count, version)
+def build(path: Path | None = None, chunk_size: int = 5000) -> tuple:
+    path = Path(path or snapshot_path())
+    ids, prices, offsets = array("q"), array("q"), array("Q", [0])
+    currencies, blob = bytearray(), bytearray()
+    for row in Item.objects.order_by("id").values_list(*FIELDS).iterator(chunk_size=chunk_size):
+        item_id, *strings, price, currency = row
+        ids.append(item_id)
+        prices.append(int(price))
+        for value in strings:
+            blob += (value or "").encode("utf-8")
+            offsets.append(len(blob))
+        currencies += (currency or "").encode("ascii")[:4].ljust(4, b"\0")
+
+    version = time.time_ns()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(HEADER.pack(MAGIC, version, len(ids)))
+            for part in (ids, prices, offsets):
+                fh.write(part.tobytes())
+            fh.write(currencies)
+            fh.write(blob)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return len(ids), version
+
+
+_rebuild_timer = None
+_rebuild_lock = threading.Lock()
+
+def _rebuild_in_background() -> None:
+    global _rebuild_timer
+    # изменения, закоммиченные во время сборки, запланируют следующую
+    with _rebuild_lock:
+        _rebuild_timer = None
+    try:
+        build()
+    except Exception:
+        log.exception("Не удалось пересобрать снимок каталога")
+    finally:
+        connection.close()
+
+# пересборка после коммита транзакции, где менялись Item — в фоновом потоке, а не в запросе,
+# и не чаще раза в CATALOG_SNAPSHOT_REBUILD_DELAY: изменения за это время собираются одной сборкой
+# (колбэки откатившейся транзакции Django просто выбрасывает)
+def schedule_rebuild() -> None:
+    if snapshot_path() is None or not getattr(settings, "CATALOG_SNAPSHOT_AUTO_REBUILD", True):
+        return
+
+    def start():
+        global _rebuild_timer
+        with _rebuild_lock:
+            if _rebuild_timer is not None:
+                return
+            _rebuild_timer = threading.Timer(
+                getattr(settings, "CATALOG_SNAPSHOT_REBUILD_DELAY", 2.0), _rebuild_in_background,
+            )
+            _rebuild_timer.daemon = True
+            _rebuild_timer.start()
+
+    transaction.on_commit(start)
@@ -1,7 +1,23 @@
+import logging
+import uuid
+from concurrent.futures import Future
 from decimal import ROUND_HALF_UP, Decimal
-import stripe
 from django.conf import settings
+from django.core.cache import cache
 from ..models import Discount, Tax
+from .concurrency import run_concurrently, submit_background
+from .pricing import items_subtotal_cents, order_items, quote_order
+
+log = logging.getLogger(__name__)
+
+# stripe SDK импортируется ~1 с, поэтому грузим его при первом обращении, а не при старте воркера
+def _stripe():
+    import stripe
+    return stripe
+
+# базовый класс ошибок Stripe для except-веток во views (тоже без импорта SDK заранее)
+def stripe_error():
+    return _stripe().error.StripeError
 
 def _product_data_for_item(item):
     data = {"name": item.name}
@@ -63,7 +79,7 @@ def create_checkout_session_for_item(item):
             f"({min_needed/100:.2f} {currency.upper()})."
         )
 
-    session = stripe.checkout.Session.create(
+    session = _stripe().checkout.Session.create(
         mode="payment",
         line_items=[{
             "price_data": {
@@ -79,22 +95,22 @@ def create_checkout_session_for_item(item):
     )
     return session
 
-# создание Stripe Checkout Session для заказа
-def create_checkout_session_for_order(order):
-    items_qs = order.items.all()
-    if not items_qs.exists():
-        raise ValueError("Заказ не содержит товаров")
-
-    currencies = {i.currency.lower() for i in items_qs}
-    if len(currencies) > 1:
-        raise ValueError("Смешанные валюты не поддерживаются в одном чеке")
-
-    currency = next(iter(currencies))
+# товары заказа по валютам: {"usd": [...], "eur": [...]}
+def split_items_by_currency(items) -> dict:
+    parts = {}
+    for item in items:
+        parts.setdefault((item.currency or "usd").lower(), []).append(item)
+    return parts
+
+# параметры Checkout Session для части заказа в одной валюте
+# купон и tax rates создаются здесь же (в вызывающем потоке), если их ещё нет в Stripe
+# est_total — уже известная сумма (подписанный quote), тогда заказ для проверки минимума не пересчитывается
+def _checkout_params_for_part(order, currency: str, items, group: str = "", est_total: int | None = None) -> dict:
     secret = _secret_for_currency(currency)
 
     # предварительная проверка минимума (после скидки заказа)
-    subtotal = sum(int(i.price) for i in items_qs)
-    est_total = _apply_order_discount_cents(subtotal, order)
+    if est_total is None:
+        est_total = _apply_order_discount_cents(items_subtotal_cents(items), order)
     min_needed = _min_charge_for_currency(currency)
     if est_total < min_needed:
         raise ValueError(
@@ -103,7 +119,7 @@ def create_checkout_session_for_order(order):
         )
 
     # список tax_rate ids (только активные)
-    tax_rate_ids = [ensure_stripe_tax_rate(t, api_key=secret) for t in getattr(order, "taxes", []).filter(active=True)]
+    tax_rate_ids = [ensure_stripe_tax_rate(t, currency=currency) for t in getattr(order, "taxes", []).filter(active=True)]
 
     line_items = [{
         "price_data": {
@@ -111,88 +127,148 @@ def create_checkout_session_for_order(order):
             "product_data": _product_data_for_item(item),
             "unit_amount": int(item.price),
         },
-        "quantity": 1,
+        "quantity": getattr(item, "quantity", 1),
         **({"tax_rates": tax_rate_ids} if tax_rate_ids else {}),
-    } for item in items_qs]
+    } for item in items]
+
+    metadata = {"order_id": str(order.id)}
+    if group:
+        metadata["payment_group"] = group
 
     params = dict(
         mode="payment",
         line_items=line_items,
         client_reference_id=str(order.id),
-        metadata={"order_id": str(order.id)},
+        metadata=metadata,
         success_url=settings.SUCCESS_URL,
         cancel_url=settings.CANCEL_URL,
-        api_key=secret,  # ключ под валюту заказа
+        api_key=secret,  # ключ под валюту части
     )
 
     # применяем скидку
     if getattr(order, "discount", None) and order.discount and order.discount.active:
-        coupon_id = ensure_stripe_coupon(order.discount, api_key=secret)
+        coupon_id = ensure_stripe_coupon(order.discount, currency=currency)
         params["discounts"] = [{"coupon": coupon_id}]
+    return params
+
+# параметры Checkout Session для заказа в одной валюте (ходит в БД и при необходимости создаёт купон/tax rates)
+def checkout_params_for_order(order, est_total: int | None = None) -> dict:
+    items = order_items(order)
+    if not items:
+        raise ValueError("Заказ не содержит товаров")
+
+    parts = split_items_by_currency(items)
+    if len(parts) > 1:
+        raise ValueError("Смешанные валюты не поддерживаются в одном чеке")
+
+    currency, items = next(iter(parts.items()))
+    return _checkout_params_for_part(order, currency, items, est_total=est_total)
 
-    session = stripe.checkout.Session.create(**params)
+# создание Stripe Checkout Session для заказа
+# idempotency_key: повтор с тем же ключом (в течение суток) вернёт уже созданную сессию
+def create_checkout_session_for_order(order, idempotency_key: str | None = None, est_total: int | None = None):
+    params = checkout_params_for_order(order, est_total=est_total)
+    if idempotency_key:
+        params["idempotency_key"] = idempotency_key
+    session = _stripe().checkout.Session.create(**params)
     return session
 
-# гарантируем наличие купона в Stripe и возвращаем его id
-def ensure_stripe_coupon(discount: Discount, api_key: str | None = None) -> str:
-    if discount.stripe_coupon_id and discount.active:
-        return discount.stripe_coupon_id
+# параллельно создаёт по одной части на валюту заказа, итоговая задержка ≈ самый медленный вызов Stripe
+# create(params) вызывается в потоках; все подготовительные запросы к БД/Stripe делаются заранее
+# если какая-то часть не создалась, уже созданные отменяются discard(part) и поднимается первая ошибка
+# возвращает (group, [{"currency", "items", "params", "result"}]); group пустой, если валюта одна
+def _create_split_parts(order, build_params, create, discard) -> tuple:
+    items = order_items(order)
+    if not items:
+        raise ValueError("Заказ не содержит товаров")
+
+    by_currency = split_items_by_currency(items)
+    group = uuid.uuid4().hex if len(by_currency) > 1 else ""
+    parts = [
+        {"currency": cur, "items": its, "params": build_params(order, cur, its, group=group)}
+        for cur, its in by_currency.items()
+    ]
+
+    def run(part):
+        part["result"] = create(part["params"])
+
+    errors = [error for _, error in run_concurrently(run, parts) if error is not None]
+    if errors:
+        for part in parts:
+            if "result" not in part:
+                continue
+            try:
+                discard(part)
+            except Exception:
+                log.warning("Не удалось отменить часть %s заказа %s", part["result"].id, order.id, exc_info=True)
+        raise errors[0]
+    return group, parts
+
+# Checkout Sessions для заказа со смешанными валютами (по одной на валюту, каждая — в своём аккаунте)
+def create_checkout_sessions_for_order_split(order) -> tuple:
+    return _create_split_parts(
+        order, _checkout_params_for_part,
+        lambda params: _stripe().checkout.Session.create(**params),
+        lambda part: _stripe().checkout.Session.expire(part["result"].id, api_key=part["params"]["api_key"]),
+    )
 
-    coupon = stripe.Coupon.create(
+# купон и tax rate существуют только в том Stripe-аккаунте, где созданы: для аккаунта валюты по умолчанию
+# id хранится в stripe_coupon_id / stripe_tax_rate_id, для аккаунтов других валют — в словаре {currency: id}
+def _account_currency(currency: str | None) -> str | None:
+    default = getattr(settings, "DEFAULT_CURRENCY", "usd")
+    if currency is None or _secret_for_currency(currency) == _secret_for_currency(default):
+        return None
+    return currency.lower()
+
+# гарантируем наличие купона в Stripe-аккаунте валюты (по умолчанию — основного) и возвращаем его id
+def ensure_stripe_coupon(discount: Discount, currency: str | None = None) -> str:
+    account = _account_currency(currency)
+    coupon_id = discount.stripe_coupon_ids.get(account) if account else discount.stripe_coupon_id
+    if coupon_id and discount.active:
+        return coupon_id
+
+    coupon = _stripe().Coupon.create(
         percent_off=int(discount.percent_off),
         duration="once",
         name=discount.name,
-        api_key=api_key or _secret_for_currency(getattr(settings, "DEFAULT_CURRENCY", "usd")),
+        api_key=_secret_for_currency(currency or getattr(settings, "DEFAULT_CURRENCY", "usd")),
     )
-    discount.stripe_coupon_id = coupon.id
-    discount.save(update_fields=["stripe_coupon_id"])
+    if account:
+        discount.stripe_coupon_ids = {**discount.stripe_coupon_ids, account: coupon.id}
+        discount.save(update_fields=["stripe_coupon_ids"])
+    else:
+        discount.stripe_coupon_id = coupon.id
+        discount.save(update_fields=["stripe_coupon_id"])
     return coupon.id
 
-# гарантируем наличие TaxRate в Stripe и возвращаем его id
-def ensure_stripe_tax_rate(tax: Tax, api_key: str | None = None) -> str:
-    if tax.stripe_tax_rate_id and tax.active:
-        return tax.stripe_tax_rate_id
+# гарантируем наличие TaxRate в Stripe-аккаунте валюты (по умолчанию — основного) и возвращаем его id
+def ensure_stripe_tax_rate(tax: Tax, currency: str | None = None) -> str:
+    account = _account_currency(currency)
+    tax_rate_id = tax.stripe_tax_rate_ids.get(account) if account else tax.stripe_tax_rate_id
+    if tax_rate_id and tax.active:
+        return tax_rate_id
 
-    txr = stripe.TaxRate.create(
+    txr = _stripe().TaxRate.create(
         display_name=tax.display_name,
         percentage=float(tax.percentage),
         inclusive=bool(tax.inclusive),
         active=True,
-        api_key=api_key or _secret_for_currency(getattr(settings, "DEFAULT_CURRENCY", "usd")),
+        api_key=_secret_for_currency(currency or getattr(settings, "DEFAULT_CURRENCY", "usd")),
     )
-    tax.stripe_tax_rate_id = txr.id
+    if account:
+        tax.stripe_tax_rate_ids = {**tax.stripe_tax_rate_ids, account: txr.id}
+        update_fields = ["stripe_tax_rate_ids"]
+    else:
+        tax.stripe_tax_rate_id = txr.id
+        update_fields = ["stripe_tax_rate_id"]
     tax.active = True
-    tax.save(update_fields=["stripe_tax_rate_id", "active"])
+    tax.save(update_fields=update_fields + ["active"])
     return txr.id
 
 # приблизительная сумма заказа (в центах): (subtotal - discount) + exclusive taxes
 # оценка нужна для валидации минимальной суммы и для amount в PaymentIntent
 def _estimate_order_total_cents(order) -> int:
-    items_qs = order.items.all()
-    subtotal = sum(int(i.price) for i in items_qs)
-
-    # скидка
-    d = getattr(order, "discount", None)
-    if d and getattr(d, "active", False):
-        off = int(
-            (Decimal(subtotal) * Decimal(int(d.percent_off)) / Decimal(100))
-            .quantize(Decimal("1"), rounding=ROUND_HALF_UP)
-        )
-    else:
-        off = 0
-
-    taxable_base = subtotal - off
-
-    # налоги сверху (exclusive)
-    exclusive_total = 0
-    for t in getattr(order, "taxes", []).filter(active=True):
-        if not t.inclusive:
-            tax_amount = (Decimal(taxable_base) * Decimal(t.percentage) / Decimal(100)) \
-                         .quantize(Decimal("1"), rounding=ROUND_HALF_UP)
-            exclusive_total += int(tax_amount)
-
-    total = taxable_base + exclusive_total
-    return max(0, int(total))
+    return max(0, int(quote_order(order)["total_cents"]))
 
 # создаёт PaymentIntent для одиночного товара
 def create_payment_intent_for_item(item):
@@ -207,7 +283,7 @@ def create_payment_intent_for_item(item):
             f"({min_needed/100:.2f} {currency.upper()})."
         )
 
-    intent = stripe.PaymentIntent.create(
+    intent = _stripe().PaymentIntent.create(
         amount=amount,
         currency=currency,
         metadata={
@@ -220,20 +296,15 @@ def create_payment_intent_for_item(item):
     )
     return intent
 
-# создаёт PaymentIntent для заказа
-def create_payment_intent_for_order(order):
-    items_qs = order.items.all()
-    if not items_qs.exists():
-        raise ValueError("Заказ пуст")
-
-    currencies = {i.currency.lower() for i in items_qs}
-    if len(currencies) > 1:
-        raise ValueError("Смешанные валюты не поддерживаются в одном PaymentIntent")
+# параметры PaymentIntent для части заказа в одной валюте
+def _intent_params_for_part(order, currency: str, items, group: str = "") -> dict:
+    amount = max(0, int(quote_order(order, items=items)["total_cents"]))
+    return _intent_params(order.id, currency, amount, group=group)
 
-    currency = next(iter(currencies))
+# параметры PaymentIntent заказа по уже посчитанной сумме
+def _intent_params(order_id: int, currency: str, amount: int, group: str = "") -> dict:
     secret = _secret_for_currency(currency)
 
-    amount = _estimate_order_total_cents(order)
     min_needed = _min_charge_for_currency(currency)
     if amount < min_needed:
         raise ValueError(
@@ -241,14 +312,69 @@ def create_payment_intent_for_order(order):
             f"({min_needed/100:.2f} {currency.upper()}). Увеличьте цены или уменьшите скидку."
         )
 
-    intent = stripe.PaymentIntent.create(
+    metadata = {
+        "kind": "order",
+        "order_id": str(order_id),
+    }
+    if group:
+        metadata["payment_group"] = group
+
+    return dict(
         amount=amount,
         currency=currency,
-        metadata={
-            "kind": "order",
-            "order_id": str(order.id),
-        },
+        metadata=metadata,
         automatic_payment_methods={"enabled": True},
         api_key=secret,
     )
-    return intent
\ No newline at end of file
+
+# создаёт PaymentIntent для заказа
+def create_payment_intent_for_order(order):
+    items = order_items(order)
+    if not items:
+        raise ValueError("Заказ пуст")
+
+    parts = split_items_by_currency(items)
+    if len(parts) > 1:
+        raise ValueError("Смешанные валюты не поддерживаются в одном PaymentIntent")
+
+    currency, items = next(iter(parts.items()))
+    intent = _stripe().PaymentIntent.create(**_intent_params_for_part(order, currency, items))
+    return intent
+
+# PaymentIntent по подписанному расчёту (services.quotes): без загрузки позиций и пересчёта
+def create_payment_intent_for_quote(order, currency: str, amount: int):
+    return _stripe().PaymentIntent.create(**_intent_params(order.id, currency, amount))
+
+# PaymentIntents для заказа со смешанными валютами (по одному на валюту)
+def create_payment_intents_for_order_split(order) -> tuple:
+    return _create_split_parts(
+        order, _intent_params_for_part,
+        lambda params: _stripe().PaymentIntent.create(**params),
+        lambda part: _stripe().PaymentIntent.cancel(part["result"].id, api_key=part["params"]["api_key"]),
+    )
+
+# PaymentIntent для встраивания в страницу заказа (без второго запроса браузера)
+# сумма берётся из уже сделанного расчёта страницы; интент переиспользуется из кэша, пока не изменились
+# заказ, валюта и сумма (тот же ключ — idempotency key, поэтому и другие воркеры получат тот же интент)
+# params готовятся здесь, в фоне — только вызов Stripe; возвращает (cache_key, Future с {"id", "client_secret"})
+def prefetch_order_intent(order, items, amount: int) -> tuple:
+    parts = split_items_by_currency(items)
+    if len(parts) != 1:
+        raise ValueError("Встроенный PaymentIntent возможен только для заказа в одной валюте")
+    currency = next(iter(parts))
+    key = f"order-intent:{order.id}:{currency}:{amount}"
+
+    cached = cache.get(key)
+    if cached:
+        done = Future()
+        done.set_result(cached)
+        return key, done
+
+    params = _intent_params(order.id, currency, max(0, int(amount)))
+    params["idempotency_key"] = key
+
+    def create():
+        intent = _stripe().PaymentIntent.create(**params)
+        return {"id": intent.id, "client_secret": intent.client_secret}
+
+    return key, submit_background(create)
@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import CheckoutSession, Item, Order, OrderPayment
+from . import snapshot
+from .concurrency import run_concurrently
+from .payments import fully_paid_order_ids
+from .revenue import record_paid
+from .stripe_api import _stripe, _secret_for_currency, _product_data_for_item
+
+# массовые операции со Stripe для админки
+# в потоках выполняются только вызовы Stripe, запись в БД — одним bulk_update в вызывающем потоке
+
+
+def _succeeded(results) -> list:
+    return [obj for obj, error in results if error is None]
+
+def _default_secret() -> str:
+    return _secret_for_currency(getattr(settings, "DEFAULT_CURRENCY", "usd"))
+
+# Item -> Stripe Product (создаём или обновляем name/description)
+def _push_item(item):
+    stripe = _stripe()
+    secret = _secret_for_currency(item.currency)
+    fields = _product_data_for_item(item)
+    if item.stripe_product_id:
+        stripe.Product.modify(item.stripe_product_id, **{"description": "", **fields}, api_key=secret)
+    else:
+        product = stripe.Product.create(**fields, metadata={"item_id": str(item.id)}, api_key=secret)
+        item.stripe_product_id = product.id
+
+# Discount -> Stripe Coupon (percent_off у купона неизменяем, обновляется только name)
+def _push_discount(discount):
+    stripe = _stripe()
+    secret = _default_secret()
+    if discount.stripe_coupon_id:
+        stripe.Coupon.modify(discount.stripe_coupon_id, name=discount.name, api_key=secret)
+    else:
+        coupon = stripe.Coupon.create(
+            percent_off=int(discount.percent_off),
+            duration="once",
+            name=discount.name,
+            api_key=secret,
+        )
+        discount.stripe_coupon_id = coupon.id
+
+# Tax -> Stripe TaxRate (процент и inclusive неизменяемы, обновляются display_name и active)
+def _push_tax(tax):
+    stripe = _stripe()
+    secret = _default_secret()
+    if tax.stripe_tax_rate_id:
+        stripe.TaxRate.modify(tax.stripe_tax_rate_id, display_name=tax.display_name,
+                              active=bool(tax.active), api_key=secret)
+    else:
+        txr = stripe.TaxRate.create(
+            display_name=tax.display_name,
+            percentage=float(tax.percentage),
+            inclusive=bool(tax.inclusive),
+            active=bool(tax.active),
+            api_key=secret,
+        )
+        tax.stripe_tax_rate_id = txr.id
+
+# пушит объекты в Stripe и сохраняет полученные id одним bulk_update
+def push_to_stripe(queryset, max_workers: int | None = None) -> list:
+    model = queryset.model
+    pushers = {
+        "item": (_push_item, ["stripe_product_id"]),
+        "discount": (_push_discount, ["stripe_coupon_id"]),
+        "tax": (_push_tax, ["stripe_tax_rate_id"]),
+    }
+    fn, fields = pushers[model._meta.model_name]
+    results = run_concurrently(fn, queryset, max_workers)
+    model.objects.bulk_update(_succeeded(results), fields, batch_size=500)
+    if model is Item:
+        snapshot.schedule_rebuild()
+    return results
+
+# пока шли запросы в Stripe, часть строк мог оплатить webhook — их повторно не учитываем
+def _still_unpaid(model, objects) -> list:
+    if not objects:
+        return []
+    unpaid = set(
+        model.objects.select_for_update().filter(pk__in=[o.pk for o in objects], paid=False)
+        .values_list("pk", flat=True)
+    )
+    return [o for o in objects if o.pk in unpaid]
+
+def _set_paid_at(objects) -> None:
+    now = timezone.now()
+    for obj in objects:
+        obj.paid_at = now
+
+def _session_is_paid(session) -> bool:
+    return getattr(session, "payment_status", None) in ("paid", "no_payment_required")
+
+# CheckoutSession: статус из Stripe Checkout Session
+def _fetch_checkout_session_paid(cs):
+    session = _stripe().checkout.Session.retrieve(cs.session_id, api_key=_secret_for_currency(cs.item.currency))
+    cs.paid = cs.paid or _session_is_paid(session)
+
+def refresh_checkout_sessions(queryset, max_workers: int | None = None) -> list:
+    sessions = list(queryset.select_related("item"))
+    was_paid = {cs.pk for cs in sessions if cs.paid}
+    results = run_concurrently(_fetch_checkout_session_paid, sessions, max_workers)
+    changed = [cs for cs in _succeeded(results) if cs.paid and cs.pk not in was_paid]
+
+    with transaction.atomic():
+        changed = _still_unpaid(CheckoutSession, changed)
+        _set_paid_at(changed)
+        CheckoutSession.objects.bulk_update(changed, ["paid", "paid_at"], batch_size=500)
+        record_paid(CheckoutSession, [cs.pk for cs in changed])
+    return results
+
+# OrderPayment: статус Checkout Session или PaymentIntent (части split-оплаты) + отметка заказа как PAID
+def _fetch_order_payment_paid(op):
+    stripe = _stripe()
+    secret = _secret_for_currency(op.currency or op.order.currency)
+    if op.session_id.startswith("pi_"):
+        intent = stripe.PaymentIntent.retrieve(op.session_id, api_key=secret)
+        op.paid = op.paid or getattr(intent, "status", None) == "succeeded"
+    else:
+        session = stripe.checkout.Session.retrieve(op.session_id, api_key=secret)
+        op.paid = op.paid or _session_is_paid(session)
+
+def refresh_order_payments(queryset, max_workers: int | None = None) -> list:
+    payments = list(queryset.select_related("order"))
+    was_paid = {op.pk for op in payments if op.paid}
+    results = run_concurrently(_fetch_order_payment_paid, payments, max_workers)
+    changed = [op for op in _succeeded(results) if op.paid and op.pk not in was_paid]
+
+    with transaction.atomic():
+        changed = _still_unpaid(OrderPayment, changed)
+        _set_paid_at(changed)
+        OrderPayment.objects.bulk_update(changed, ["paid", "paid_at"], batch_size=500)
+        record_paid(OrderPayment, [op.pk for op in changed])
+        # split-оплата закрывает заказ только когда оплачены все её части
+        order_ids = fully_paid_order_ids(changed)
+        Order.objects.filter(id__in=order_ids, paid=False).update(paid=True)
+    return results
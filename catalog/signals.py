@@ -0,0 +1,95 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Discount, Item, Order, OrderItem, Tax
+from .services import snapshot
+
+# снимок каталога пересобирается после изменения товаров (bulk_create/bulk_update/update() сигналов
+# не шлют — после них нужен build_catalog_snapshot)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def rebuild_catalog_snapshot(sender, **kwargs):
+    snapshot.schedule_rebuild()
+
+
+# Order.version: всё, что меняет сумму заказа, делает выданные quote-токены недействительными
+# оплаченные заказы не трогаем — токены для них и так не принимаются
+# изменение Item заказы не трогает (их может быть сколько угодно) — токен сверяется с Item.updated_at
+
+def _bump(orders) -> None:
+    orders.filter(paid=False).update(version=F("version") + 1)
+
+# UPDATE не меняет загруженный экземпляр — подтягиваем новое значение, чтобы он не разошёлся с БД
+def _bump_instance(order) -> None:
+    _bump(Order.objects.filter(pk=order.pk))
+    order.version = Order.objects.filter(pk=order.pk).values_list("version", flat=True).first() or order.version
+
+@receiver(post_save, sender=Order)
+def bump_order_version(sender, instance, created, **kwargs):
+    if not created:
+        _bump_instance(instance)
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def bump_version_on_line_change(sender, instance, **kwargs):
+    if OrderItem.order.is_cached(instance):
+        _bump_instance(instance.order)
+    else:
+        _bump(Order.objects.filter(pk=instance.order_id))
+
+@receiver(m2m_changed, sender=Order.taxes.through)
+def bump_version_on_taxes_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            _bump_instance(instance)
+    elif action in ("post_add", "post_remove"):
+        _bump(Order.objects.filter(pk__in=pk_set))
+    elif action == "pre_clear":
+        # tax.orders.clear(): после очистки затронутые заказы уже не найти
+        _bump(Order.objects.filter(taxes=instance))
+
+# скидка и налог меняют сумму заказа только этими полями; служебные сохранения (id купона/tax rate
+# в Stripe из ensure_stripe_*) заказы и выданные токены не трогают
+PRICING_FIELDS = {Discount: ("percent_off", "active"), Tax: ("percentage", "inclusive", "active")}
+
+def _pricing_values(instance) -> tuple:
+    # __dict__, а не getattr: отложенное (defer) поле не должно догружаться ради сигнала
+    return tuple(instance.__dict__.get(name) for name in PRICING_FIELDS[type(instance)])
+
+@receiver(post_init, sender=Discount)
+@receiver(post_init, sender=Tax)
+def remember_pricing_values(sender, instance, **kwargs):
+    instance._pricing_values = _pricing_values(instance)
+
+# True, если save() изменил поля, влияющие на сумму; запоминает новые значения
+def _pricing_changed(instance, created: bool, update_fields) -> bool:
+    if created:
+        return False
+    fields = PRICING_FIELDS[type(instance)]
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return False
+    # отложенное поле, которому присвоили значение, считается изменённым (None -> значение)
+    old, new = instance._pricing_values, _pricing_values(instance)
+    instance._pricing_values = new
+    return old != new
+
+@receiver(post_save, sender=Discount)
+def bump_version_on_discount_change(sender, instance, created, update_fields, **kwargs):
+    if _pricing_changed(instance, created, update_fields):
+        _bump(Order.objects.filter(discount=instance))
+
+@receiver(post_save, sender=Tax)
+def bump_version_on_tax_change(sender, instance, created, update_fields, **kwargs):
+    if _pricing_changed(instance, created, update_fields):
+        _bump(Order.objects.filter(taxes=instance))
+
+@receiver(pre_delete, sender=Discount)
+def bump_version_on_discount_delete(sender, instance, **kwargs):
+    _bump(Order.objects.filter(discount=instance))
+
+@receiver(pre_delete, sender=Tax)
+def bump_version_on_tax_delete(sender, instance, **kwargs):
+    _bump(Order.objects.filter(taxes=instance))
@@ -0,0 +1,70 @@
+// общий клиентский код страниц оплаты
+// <body data-stripe-key="pk_..."> и <button id="pay" data-mode="checkout|intent" data-url="...">
+// data-client-secret у кнопки — интент уже создан при рендере страницы, запрос к data-url не нужен
+// split-оплата (ответ {"group", "parts"}) — только через API: кнопки страниц ходят с ?split=0,
+// и заказ со смешанными валютами получает понятную 400
+(function () {
+  const button = document.getElementById('pay');
+  const note = document.getElementById('note');
+  const stripe = Stripe(document.body.dataset.stripeKey);
+  const mode = button.dataset.mode;
+
+  const notify = (msg, ok = false) => { note.textContent = msg || ''; note.classList.toggle('ok', !!ok); };
+
+  async function fetchJSON(url) {
+    const res = await fetch(url, { headers: { 'Accept': 'application/json' } });
+    const text = await res.text();
+    let data = {};
+    try { data = text ? JSON.parse(text) : {}; } catch {}
+    return { res, data, text };
+  }
+
+  // PaymentIntent flow: карта вводится прямо на странице
+  let card = null;
+  if (mode === 'intent') {
+    card = stripe.elements().create('card');
+    card.mount('#card-element');
+  }
+
+  // Checkout flow: редирект на страницу Stripe
+  async function payCheckout(data) {
+    const { error } = await stripe.redirectToCheckout({ sessionId: data.id });
+    if (error) {
+      console.error('Stripe redirect error:', error);
+      notify(error.message);
+    }
+  }
+
+  async function payIntent(data) {
+    const result = await stripe.confirmCardPayment(data.client_secret, { payment_method: { card } });
+    if (result.error) {
+      console.error('PI confirm error', result.error);
+      notify(result.error.message || 'Оплата не удалась');
+    } else if (result.paymentIntent && result.paymentIntent.status === 'succeeded') {
+      notify('Оплата прошла успешно!', true);
+    } else {
+      notify(`Status: ${result.paymentIntent && result.paymentIntent.status}`);
+    }
+  }
+
+  button.addEventListener('click', async () => {
+    notify('');
+    try {
+      if (mode === 'intent' && button.dataset.clientSecret) {
+        await payIntent({ client_secret: button.dataset.clientSecret });
+        return;
+      }
+      const { res, data, text } = await fetchJSON(button.dataset.url);
+      if (!res.ok) {
+        const msg = (data && data.error) || text || `HTTP ${res.status}`;
+        console.error('Checkout error:', { status: res.status, data, raw: text });
+        notify(msg);
+        return;
+      }
+      await (mode === 'intent' ? payIntent(data) : payCheckout(data));
+    } catch (e) {
+      console.error(e);
+      notify(e.message || 'Неизвестная ошибка');
+    }
+  });
+})();
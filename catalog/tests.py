@@ -0,0 +1,160 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import TestCase
+
+from .models import CheckoutSession, DailyRevenue, Discount, Item, Order, OrderItem, OrderPayment, Tax
+from .services.payments import mark_checkout_session_paid, mark_order_payment_paid
+from .services.pricing import order_items, quote_order
+from .services.quotes import make_quote_token, verified_quote
+from .services.stripe_api import ensure_stripe_coupon, ensure_stripe_tax_rate
+
+
+def _fake_stripe():
+    return SimpleNamespace(
+        Coupon=SimpleNamespace(create=lambda **kw: SimpleNamespace(id="co_test")),
+        TaxRate=SimpleNamespace(create=lambda **kw: SimpleNamespace(id="txr_test")),
+    )
+
+
+# quote-токен страницы заказа: принимается, пока не изменились позиции, товары, скидка и налоги;
+# служебные сохранения (id купона / tax rate в Stripe) его не сбрасывают
+class QuoteTokenTests(TestCase):
+    def setUp(self):
+        self.item = Item.objects.create(name="Mug", price=2000, currency="usd")
+        self.other = Item.objects.create(name="Lamp", price=3500, currency="usd")
+        self.discount = Discount.objects.create(name="PROMO10", percent_off=10)
+        self.tax = Tax.objects.create(display_name="VAT", percentage="20.00")
+        self.order = Order.objects.create(currency="usd", discount=self.discount)
+        OrderItem.objects.create(order=self.order, item=self.item, quantity=2)
+        self.order.taxes.set([self.tax])
+
+    def _token(self) -> str:
+        order = Order.objects.select_related("discount").get(pk=self.order.pk)
+        items = order_items(order)
+        return make_quote_token(order, "usd", quote_order(order, items=items), items)
+
+    def _verified(self, token):
+        return verified_quote(token, Order.objects.get(pk=self.order.pk))
+
+    def test_token_accepted_for_unchanged_order(self):
+        quote = self._verified(self._token())
+        self.assertIsNotNone(quote)
+        self.assertEqual(quote["amount"], quote["amounts"]["total_cents"])
+        self.assertEqual(quote["amounts"]["subtotal_cents"], 4000)
+
+    def test_rejected_after_line_change(self):
+        token = self._token()
+        OrderItem.objects.create(order=self.order, item=self.other)
+        self.assertIsNone(self._verified(token))
+
+    def test_rejected_after_quantity_change(self):
+        token = self._token()
+        line = OrderItem.objects.get(order=self.order, item=self.item)
+        line.quantity = 3
+        line.save()
+        self.assertIsNone(self._verified(token))
+
+    def test_rejected_after_item_price_change(self):
+        token = self._token()
+        self.item.price = 2500
+        self.item.save()
+        self.assertIsNone(self._verified(token))
+
+    def test_rejected_after_discount_change(self):
+        token = self._token()
+        self.discount.percent_off = 20
+        self.discount.save()
+        self.assertIsNone(self._verified(token))
+
+    def test_rejected_after_tax_change(self):
+        token = self._token()
+        self.tax.percentage = "10.00"
+        self.tax.save()
+        self.assertIsNone(self._verified(token))
+
+    def test_rejected_after_taxes_m2m_change(self):
+        token = self._token()
+        self.order.taxes.clear()
+        self.assertIsNone(self._verified(token))
+
+    def test_accepted_after_stripe_bookkeeping_saves(self):
+        token = self._token()
+        with mock.patch("catalog.services.stripe_api._stripe", _fake_stripe), \
+                mock.patch("catalog.services.stripe_api._secret_for_currency", return_value="sk_test"):
+            ensure_stripe_coupon(Discount.objects.get(pk=self.discount.pk))
+            ensure_stripe_tax_rate(Tax.objects.get(pk=self.tax.pk))
+        self.assertEqual(Discount.objects.get(pk=self.discount.pk).stripe_coupon_id, "co_test")
+        self.assertIsNotNone(self._verified(token))
+
+    def test_accepted_after_rename(self):
+        token = self._token()
+        self.discount.name = "PROMO10-renamed"
+        self.discount.save()
+        self.assertIsNotNone(self._verified(token))
+
+    def test_stale_instance_save_keeps_version(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        OrderItem.objects.create(order=self.order, item=self.other)
+        bumped = Order.objects.get(pk=self.order.pk).version
+        stale.save()
+        self.assertGreater(Order.objects.get(pk=self.order.pk).version, bumped)
+        self.assertEqual(stale.version, Order.objects.get(pk=self.order.pk).version)
+
+
+# split-оплата: заказ закрывается только когда оплачены все group_parts частей группы;
+# повторный webhook не учитывает оплату в итогах выручки второй раз
+class PaymentTests(TestCase):
+    def setUp(self):
+        self.usd = Item.objects.create(name="Mug", price=2000, currency="usd")
+        self.eur = Item.objects.create(name="Lamp", price=3000, currency="eur")
+        self.order = Order.objects.create(currency="usd")
+        OrderItem.objects.create(order=self.order, item=self.usd)
+        OrderItem.objects.create(order=self.order, item=self.eur)
+
+    def _parts(self):
+        return [
+            OrderPayment.objects.create(order=self.order, session_id=f"pi_{currency}", currency=currency,
+                                        group="g1", group_parts=2, total_cents=cents, subtotal_cents=cents,
+                                        discount_cents=0, tax_cents=0)
+            for currency, cents in (("usd", 2000), ("eur", 3000))
+        ]
+
+    def test_split_group_closes_only_when_all_parts_paid(self):
+        usd, eur = self._parts()
+        _, order_paid = mark_order_payment_paid(usd.session_id)
+        self.assertFalse(order_paid)
+        self.assertFalse(Order.objects.get(pk=self.order.pk).paid)
+
+        _, order_paid = mark_order_payment_paid(eur.session_id)
+        self.assertTrue(order_paid)
+        self.assertTrue(Order.objects.get(pk=self.order.pk).paid)
+
+    def test_split_group_with_deleted_part_stays_open(self):
+        usd, eur = self._parts()
+        eur.delete()
+        _, order_paid = mark_order_payment_paid(usd.session_id)
+        self.assertFalse(order_paid)
+        self.assertFalse(Order.objects.get(pk=self.order.pk).paid)
+
+    def test_split_order_counted_once_in_revenue(self):
+        for part in self._parts():
+            mark_order_payment_paid(part.session_id)
+        rows = {r.currency: r for r in DailyRevenue.objects.all()}
+        self.assertEqual(rows["usd"].revenue_cents, 2000)
+        self.assertEqual(rows["eur"].revenue_cents, 3000)
+        self.assertEqual(sum(r.order_count for r in rows.values()), 1)
+
+    def test_record_paid_is_idempotent(self):
+        op = OrderPayment.objects.create(order=self.order, session_id="cs_once", total_cents=5000,
+                                         subtotal_cents=5000, discount_cents=0, tax_cents=0)
+        mark_order_payment_paid(op.session_id)
+        mark_order_payment_paid(op.session_id)
+        row = DailyRevenue.objects.get()
+        self.assertEqual((row.revenue_cents, row.order_count), (5000, 1))
+
+        CheckoutSession.objects.create(item=self.usd, session_id="cs_item", total_cents=2000,
+                                       subtotal_cents=2000, discount_cents=0, tax_cents=0)
+        self.assertTrue(mark_checkout_session_paid("cs_item"))
+        self.assertFalse(mark_checkout_session_paid("cs_item"))
+        self.assertEqual(DailyRevenue.objects.get(currency="usd").revenue_cents, 7000)
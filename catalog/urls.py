@@ -1,5 +1,9 @@
 from django.urls import path
-from .views import buy_item_intent, buy_order_intent, item_intent_page, item_page, buy_item, buy_order, order_intent_page, order_page, stripe_webhook
+from .views.pages import item_intent_page, item_page, order_intent_page, order_page
+from .views.checkout import buy_item_intent, buy_order_intent, buy_item, buy_order
+from .views.webhook import stripe_webhook
+from .views.export import export_payments
+from .views.cart import cart_add, cart_checkout, cart_detail, cart_discount, cart_line
 
 urlpatterns = [
     path("item/<int:id>/", item_page, name="item-page"),
@@ -15,5 +19,14 @@ urlpatterns = [
     path("order-intent/<int:order_id>/", order_intent_page, name="order-intent-page"),
     path("buy-order-intent/<int:order_id>/", buy_order_intent, name="buy-order-intent"),
 
+    # корзина в сессии
+    path("cart/", cart_detail, name="cart"),
+    path("cart/items/", cart_add, name="cart-add"),
+    path("cart/items/<int:item_id>/", cart_line, name="cart-line"),
+    path("cart/discount/", cart_discount, name="cart-discount"),
+    path("cart/checkout/", cart_checkout, name="cart-checkout"),
+
     path("stripe/webhook/", stripe_webhook, name="stripe-webhook"),
-]
\ No newline at end of file
+
+    path("export/payments/", export_payments, name="export-payments"),
+]
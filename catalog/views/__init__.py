@@ -0,0 +1,23 @@
+# views разнесены по модулям, чтобы webhook и checkout импортировались независимо
+# и ни один из них не тянул stripe SDK при старте
+# пакет ничего не импортирует сам: catalog.views.webhook не должен грузить страницы, checkout и корзину;
+# `from catalog.views import buy_item` по-прежнему работает — модуль подгружается при первом обращении
+from importlib import import_module
+
+_EXPORTS = {
+    "pages": ("item_page", "order_page", "item_intent_page", "order_intent_page"),
+    "checkout": ("buy_item", "buy_order", "buy_item_intent", "buy_order_intent"),
+    "webhook": ("stripe_webhook",),
+    "export": ("export_payments",),
+    "cart": ("cart_detail", "cart_add", "cart_line", "cart_discount", "cart_checkout"),
+}
+_MODULE_BY_NAME = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULE_BY_NAME)
+
+
+def __getattr__(name):
+    module = _MODULE_BY_NAME.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(f".{module}", __name__), name)
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.http import Http404
+
+from ..services.snapshot import get_item
+
+# возвращает publishable key под конкретную валюту
+# порядок поиска: settings.get_stripe_publishable_for(cur), settings.STRIPE_KEYS[cur]['publishable'], settings.STRIPE_PUBLISHABLE_KEY
+def _publishable_for_currency(currency: str) -> str:
+    cur = (currency or getattr(settings, "DEFAULT_CURRENCY", "usd")).lower()
+
+    # кастомный resolver из settings
+    if hasattr(settings, "get_stripe_publishable_for"):
+        try:
+            key = settings.get_stripe_publishable_for(cur)
+            if key:
+                return key
+        except Exception:
+            pass
+
+    keys = getattr(settings, "STRIPE_KEYS", None)
+    if isinstance(keys, dict):
+        pair = keys.get(cur) or keys.get(getattr(settings, "DEFAULT_CURRENCY", "usd"), {})
+        if isinstance(pair, dict) and pair.get("publishable"):
+            return pair["publishable"]
+
+    # fallback — один общий публичный ключ
+    return getattr(settings, "STRIPE_PUBLISHABLE_KEY", "")
+
+# флаг режима из query-параметра (1/true/yes), по умолчанию — значение настройки
+def _query_flag(request, name: str, setting: str) -> bool:
+    flag = request.GET.get(name)
+    if flag is None:
+        return bool(getattr(settings, setting, False))
+    return flag.lower() in ("1", "true", "yes")
+
+# товар для показа (страницы, корзина): из снимка каталога, если он есть, иначе из БД
+# снимок может отставать от БД, поэтому суммы к оплате по нему не считаются
+def _get_item_or_404(item_id: int):
+    item = get_item(item_id)
+    if item is None:
+        raise Http404("Item not found")
+    return item
@@ -0,0 +1,103 @@
+import json
+
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+
+from ..services.cart import Cart, PricesChanged
+from ..services.snapshot import get_items
+from ._common import _get_item_or_404
+
+# JSON API корзины в сессии; ответы на изменения содержат только изменённую строку и итоги,
+# поэтому их размер и стоимость не зависят от числа строк
+# POST принимает JSON ({"item_id": 1, "quantity": 2}) или обычную форму, нужен CSRF-токен (X-CSRFToken)
+
+
+def _payload(request) -> dict:
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            raise ValueError("Некорректный JSON")
+        if not isinstance(data, dict):
+            raise ValueError("Ожидается JSON-объект")
+        return data
+    return request.POST.dict()
+
+def _int(data: dict, name: str, default=None) -> int:
+    value = data.get(name, default)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} должен быть целым числом")
+
+def _changed(cart: Cart, item_id: int | None = None) -> JsonResponse:
+    body = {"totals": cart.totals()}
+    if item_id is not None:
+        body["line"] = cart.line(item_id)
+    return JsonResponse(body)
+
+def _error(e: Exception) -> JsonResponse:
+    return JsonResponse({"error": str(e)}, status=400)
+
+@require_GET
+def cart_detail(request):
+    cart = Cart(request.session)
+    lines = cart.lines()
+    names = get_items(line["item_id"] for line in lines)
+    for line in lines:
+        item = names.get(line["item_id"])
+        line["name"] = item.name if item else ""
+    return JsonResponse({"lines": lines, "totals": cart.totals()})
+
+# добавить товар (к уже лежащему количеству)
+@require_POST
+def cart_add(request):
+    cart = Cart(request.session)
+    try:
+        data = _payload(request)
+        item = _get_item_or_404(_int(data, "item_id"))
+        cart.add(item, _int(data, "quantity", 1))
+    except ValueError as e:
+        return _error(e)
+    return _changed(cart, item.id)
+
+# POST — задать количество (0 удаляет строку), DELETE — удалить строку
+@require_http_methods(["POST", "DELETE"])
+def cart_line(request, item_id: int):
+    cart = Cart(request.session)
+    try:
+        if request.method == "DELETE":
+            cart.remove(item_id)
+        else:
+            cart.set_quantity(item_id, _int(_payload(request), "quantity"))
+    except ValueError as e:
+        return _error(e)
+    return _changed(cart, item_id)
+
+# {"code": "PROMO10"}; пустой код снимает скидку
+@require_POST
+def cart_discount(request):
+    cart = Cart(request.session)
+    try:
+        cart.apply_discount(_payload(request).get("code", ""))
+    except ValueError as e:
+        return _error(e)
+    return _changed(cart)
+
+# корзина -> Order; дальше оплата через обычные страницы заказа
+@require_POST
+def cart_checkout(request):
+    cart = Cart(request.session)
+    try:
+        order = cart.checkout()
+    except PricesChanged as e:
+        # 409: корзина уже с новыми ценами, повторный checkout создаст заказ
+        return JsonResponse({"error": str(e), "lines": e.lines, **e.changes, "totals": cart.totals()}, status=409)
+    except ValueError as e:
+        return JsonResponse({"error": str(e), "totals": cart.totals()}, status=400)
+    return JsonResponse({
+        "order_id": order.id,
+        "order_url": reverse("order-page", kwargs={"order_id": order.id}),
+        "order_intent_url": reverse("order-intent-page", kwargs={"order_id": order.id}),
+    }, status=201)
@@ -0,0 +1,156 @@
+import logging
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from ..models import CheckoutSession, Item, Order, OrderPayment
+from ..services.stripe_api import create_checkout_session_for_item, create_checkout_session_for_order
+from ..services.stripe_api import create_payment_intent_for_item, create_payment_intent_for_order
+from ..services.stripe_api import create_checkout_sessions_for_order_split, create_payment_intents_for_order_split
+from ..services.stripe_api import create_payment_intent_for_quote, stripe_error
+from ..services.pricing import charged_amounts, item_charged_amounts, quote_order
+from ..services.quotes import verified_quote
+from ._common import _publishable_for_currency, _query_flag
+
+log = logging.getLogger(__name__)
+
+# split-оплата заказа со смешанными валютами: ?split=1 или STRIPE_SPLIT_MIXED_CURRENCY=True
+# ответ с частями ({"group", "parts"}) разбирает клиент API; страницы заказа передают ?split=0
+def _split_requested(request) -> bool:
+    return _query_flag(request, "split", "STRIPE_SPLIT_MIXED_CURRENCY")
+
+# суммы, которые запишет платёж заказа: из подписанного расчёта страницы или пересчётом позиций
+def _order_amounts(order, quote=None, items=None) -> dict:
+    if quote is not None:
+        return quote["amounts"]
+    return charged_amounts(quote_order(order, items=items))
+
+# одна строка OrderPayment на каждую валютную часть, заказ закроется после оплаты всех
+def _record_split_parts(order, group: str, parts) -> None:
+    OrderPayment.objects.bulk_create([
+        OrderPayment(order=order, session_id=p["result"].id, currency=p["currency"], group=group,
+                     group_parts=len(parts), **_order_amounts(order, items=p["items"]))
+        for p in parts
+    ])
+
+# товар для оплаты — из БД: снимок каталога может отставать от цен
+@require_GET
+def buy_item(request, id: int):
+    item = get_object_or_404(Item, id=id)
+    try:
+        session = create_checkout_session_for_item(item)
+    except ValueError as e:
+        # предвалидации
+        return JsonResponse({"error": str(e)}, status=400)
+    except stripe_error() as e:
+        # ошибки, которые вернул Stripe
+        msg = getattr(e, "user_message", None) or str(e)
+        return JsonResponse({"error": msg}, status=400)
+    except Exception as e:
+        log.exception("Ошибка buy_item(id=%s)", id)
+        return JsonResponse({"error": f"Unexpected: {e}"}, status=500)
+
+    CheckoutSession.objects.create(item=item, session_id=session.id, **item_charged_amounts(item))
+    return JsonResponse({"id": session.id})
+
+@require_GET
+def buy_order(request, order_id: int):
+    order = get_object_or_404(Order, id=order_id)
+    split = _split_requested(request)
+    # подписанный расчёт со страницы заказа: пропускаем пересчёт для проверки минимума
+    # (Checkout всё равно нужны позиции, налоги и купон — их отдаёт снимок каталога/БД)
+    quote = None if split else verified_quote(request.GET.get("quote"), order)
+    if quote is None and order.items.count() == 0:
+        return JsonResponse({"error": "Заказ пуст"}, status=400)
+    try:
+        if split:
+            group, parts = create_checkout_sessions_for_order_split(order)
+        else:
+            session = create_checkout_session_for_order(order, est_total=quote["amount"] if quote else None)
+    except ValueError as e:
+        # предвалидации (минимальная сумма, смешанные валюты и т.д.)
+        return JsonResponse({"error": str(e)}, status=400)
+    except stripe_error() as e:
+        # ошибки от Stripe с понятным текстом
+        msg = getattr(e, "user_message", None) or str(e)
+        return JsonResponse({"error": msg}, status=400)
+    except Exception as e:
+        log.exception("Ошибка создания сессии Stripe (order_id=%s)", order_id)
+        return JsonResponse({"error": f"Unexpected: {e}"}, status=500)
+
+    if split and group:
+        _record_split_parts(order, group, parts)
+        return JsonResponse({
+            "group": group,
+            "parts": [{
+                "currency": p["currency"],
+                "id": p["result"].id,
+                "url": getattr(p["result"], "url", ""),
+                "publishable_key": _publishable_for_currency(p["currency"]),
+            } for p in parts],
+        })
+    amounts = _order_amounts(order, items=parts[0]["items"]) if split else _order_amounts(order, quote)
+    if split:
+        session = parts[0]["result"]
+
+    OrderPayment.objects.create(order=order, session_id=session.id, **amounts)
+    return JsonResponse({"id": session.id})
+
+@require_GET
+def buy_item_intent(request, id: int):
+    item = get_object_or_404(Item, id=id)
+    try:
+        intent = create_payment_intent_for_item(item)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except stripe_error() as e:
+        msg = getattr(e, "user_message", None) or str(e)
+        return JsonResponse({"error": msg}, status=400)
+    except Exception as e:
+        log.exception("Не удалось создать PaymentIntent для buy_item_intent(id=%s)", id)
+        return JsonResponse({"error": f"Неизвестная ошибка: {e}"}, status=500)
+
+    return JsonResponse({"client_secret": intent.client_secret})
+
+@require_GET
+def buy_order_intent(request, order_id: int):
+    order = get_object_or_404(Order, id=order_id)
+    split = _split_requested(request)
+    # подписанный расчёт со страницы заказа: сразу в Stripe с подписанной суммой, без позиций и Decimal
+    quote = None if split else verified_quote(request.GET.get("quote"), order)
+    if quote is None and order.items.count() == 0:
+        return JsonResponse({"error": "Заказ пуст"}, status=400)
+    try:
+        if split:
+            group, parts = create_payment_intents_for_order_split(order)
+        elif quote:
+            intent = create_payment_intent_for_quote(order, quote["currency"], quote["amount"])
+        else:
+            intent = create_payment_intent_for_order(order)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except stripe_error() as e:
+        msg = getattr(e, "user_message", None) or str(e)
+        return JsonResponse({"error": msg}, status=400)
+    except Exception as e:
+        log.exception("Не удалось создать PaymentIntent для buy_order_intent(order_id=%s)", order_id)
+        return JsonResponse({"error": f"Неизвестная ошибка: {e}"}, status=500)
+
+    if split and group:
+        _record_split_parts(order, group, parts)
+        return JsonResponse({
+            "group": group,
+            "parts": [{
+                "currency": p["currency"],
+                "amount": p["params"]["amount"],
+                "client_secret": p["result"].client_secret,
+                "publishable_key": _publishable_for_currency(p["currency"]),
+            } for p in parts],
+        })
+    amounts = _order_amounts(order, items=parts[0]["items"]) if split else _order_amounts(order, quote)
+    if split:
+        intent = parts[0]["result"]
+
+    # webhook payment_intent.succeeded найдёт заказ по id интента (так же, как у встроенного в страницу)
+    OrderPayment.objects.get_or_create(session_id=intent.id, defaults={"order": order, **amounts})
+    return JsonResponse({"client_secret": intent.client_secret})
@@ -0,0 +1,38 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from ..services.export import FORMATS, PAID_CHOICES, iter_payment_rows, parse_day
+
+# выгрузка платежей для бухгалтерии
+# GET /export/payments/?format=csv|ndjson&since=YYYY-MM-DD&until=YYYY-MM-DD&currency=usd&paid=paid|unpaid|all
+@staff_member_required
+@require_GET
+def export_payments(request):
+    fmt = request.GET.get("format", "csv")
+    paid = request.GET.get("paid", "paid")
+    if fmt not in FORMATS:
+        return JsonResponse({"error": f"Неизвестный формат: {fmt}"}, status=400)
+    if paid not in PAID_CHOICES:
+        return JsonResponse({"error": f"paid должен быть одним из: {', '.join(PAID_CHOICES)}"}, status=400)
+
+    dates = {}
+    for name in ("since", "until"):
+        raw = request.GET.get(name)
+        if raw:
+            dates[name] = parse_day(raw)
+            if dates[name] is None:
+                return JsonResponse({"error": f"Некорректная дата {name}: {raw}"}, status=400)
+
+    rows = iter_payment_rows(
+        since=dates.get("since"),
+        until=dates.get("until"),
+        currency=request.GET.get("currency") or None,
+        paid=PAID_CHOICES[paid],
+    )
+    stream, content_type = FORMATS[fmt]
+    response = StreamingHttpResponse(stream(rows), content_type=content_type)
+    filename = f"payments-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
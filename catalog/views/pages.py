@@ -0,0 +1,145 @@
+import logging
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render, get_object_or_404
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+from ..middleware import admission_group
+from ..models import Order, OrderPayment
+from ..services.pricing import charged_amounts, order_items, quote_order
+from ..services.quotes import make_quote_token
+from ..services.stripe_api import prefetch_order_intent
+from ._common import _get_item_or_404, _publishable_for_currency, _query_flag
+
+log = logging.getLogger(__name__)
+
+@require_GET
+def item_page(request, id: int):
+    item = _get_item_or_404(id)
+    display_price = item.price / 100
+    # ключ под валюту товара
+    pubkey = _publishable_for_currency(item.currency)
+    return render(request, "item.html", {
+        "item": item,
+        "display_price": f"{display_price:.2f}",
+        "STRIPE_PUBLISHABLE_KEY": pubkey,
+    })
+
+# токен только для неоплаченного заказа в одной валюте (смешанные оплачиваются частями с пересчётом)
+def _quote_token(order, items, q) -> str:
+    currencies = {(i.currency or "usd").lower() for i in items}
+    if order.paid or len(currencies) != 1:
+        return ""
+    return make_quote_token(order, currencies.pop(), q, items)
+
+# контекст страницы заказа (общий для /order/ и /order-intent/), расчёт — services.pricing
+def _order_context(order, items=None, q=None) -> dict:
+    if items is None:
+        items = order_items(order)
+    if q is None:
+        q = quote_order(order, items=items)
+    percent = q["discount_percent"]
+
+    def fmt(cents: int) -> str:
+        return f"{cents / 100:.2f}"
+
+    return {
+        "order": order,
+        "items": items,
+        "currency": order.currency.upper(),
+
+        "subtotal_display": fmt(q["subtotal_cents"]),
+        "has_discount": percent > 0,
+        "discount_name": order.discount.name if percent > 0 else "",
+        "discount_percent": percent,
+        "discount_amount_display": fmt(q["discount_cents"]),
+
+        "taxes": [
+            {
+                "name": line["tax"].display_name,
+                "rate": f"{line['tax'].percentage}",
+                "inclusive": line["tax"].inclusive,
+                "amount_display": fmt(line["amount_cents"]),
+            } for line in q["taxes"]
+        ],
+        "has_taxes": bool(q["taxes"]),
+
+        "total_display": fmt(q["total_cents"]),
+        # buy-эндпоинты примут эту сумму без пересчёта, пока заказ не изменится
+        "quote_token": _quote_token(order, items, q),
+        # ключ под валюту заказа
+        "STRIPE_PUBLISHABLE_KEY": _publishable_for_currency(order.currency),
+    }
+
+@require_GET
+def order_page(request, order_id: int):
+    order = get_object_or_404(Order.objects.select_related("discount"), id=order_id)
+    return render(request, "order.html", _order_context(order))
+
+@require_GET
+def item_intent_page(request, id: int):
+    item = _get_item_or_404(id)
+    display_price = item.price / 100
+    pubkey = _publishable_for_currency(item.currency)
+    return render(request, "item_intent.html", {
+        "item": item,
+        "display_price": f"{display_price:.2f}",
+        "STRIPE_PUBLISHABLE_KEY": pubkey,
+    })
+
+# client secret встроенного интента; None — страница откатывается на запрос /buy-order-intent/ по кнопке
+# ждём Stripe не дольше STRIPE_INTENT_PREFETCH_TIMEOUT: медленный Stripe не должен держать рендер страницы
+def _prefetched_intent(order, key: str, pending, amounts: dict):
+    timeout = getattr(settings, "STRIPE_INTENT_PREFETCH_TIMEOUT", 1.0)
+    try:
+        intent = pending.result(timeout=timeout)
+    except FutureTimeout:
+        log.warning("PaymentIntent для заказа %s не успел создаться за %s s", order.id, timeout)
+        return None
+    except Exception:
+        log.exception("Не удалось заранее создать PaymentIntent для заказа %s", order.id)
+        return None
+
+    cache.set(key, intent, getattr(settings, "STRIPE_INTENT_CACHE_SECONDS", 3600))
+    # webhook payment_intent.succeeded найдёт заказ по id интента
+    OrderPayment.objects.get_or_create(session_id=intent["id"], defaults={"order": order, **amounts})
+    return intent
+
+# страница с client_secret не должна оседать в кэшах прокси и браузера
+@never_cache
+@require_GET
+def order_intent_page(request, order_id: int):
+    order = get_object_or_404(Order.objects.select_related("discount"), id=order_id)
+    if order.paid or not _query_flag(request, "prefetch", "STRIPE_INTENT_ON_PAGE"):
+        return render(request, "order_intent.html", _order_context(order))
+
+    # один расчёт на страницу и интент: сумма нужна до вызова Stripe, поэтому параллельно с ним
+    # идёт только сборка контекста, а дальше view ждёт интент (не дольше STRIPE_INTENT_PREFETCH_TIMEOUT);
+    # шаблон рендерится уже с готовым client_secret
+    # повторные показы (в том числе роботами) не плодят интенты: тот же заказ и сумма —
+    # тот же idempotency key, поэтому Stripe и в других процессах вернёт уже созданный интент
+    items = order_items(order)
+    q = quote_order(order, items=items)
+    # prefetch занимает место в группе checkout; она заполнена — страница без интента, его создаст кнопка
+    group = admission_group("checkout")
+    if group is not None and not group.acquire():
+        return render(request, "order_intent.html", _order_context(order, items=items, q=q))
+
+    started = time.monotonic()
+    try:
+        try:
+            key, pending = prefetch_order_intent(order, items, q["total_cents"])
+        except ValueError:
+            # пустой заказ, смешанные валюты, сумма ниже минимума — ошибку покажет обычный запрос по кнопке
+            key, pending = None, None
+        context = _order_context(order, items=items, q=q)
+        intent = (pending and _prefetched_intent(order, key, pending, charged_amounts(q))) or {}
+    finally:
+        if group is not None:
+            group.release(time.monotonic() - started)
+    context["client_secret"] = intent.get("client_secret", "")
+    return render(request, "order_intent.html", context)
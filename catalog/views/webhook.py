@@ -0,0 +1,58 @@
+import logging
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
+
+from ..services.stripe_api import _stripe
+from ..services.payments import mark_checkout_session_paid, mark_order_payment_paid
+from ..services.retention import archive_expired_session
+
+log = logging.getLogger(__name__)
+
+def _mark_order_paid(session_id: str) -> None:
+    op, order_paid = mark_order_payment_paid(session_id)
+    if op is None:
+        return
+    if order_paid:
+        log.info("Заказ %s отмечен как PAID через сессию %s", op.order_id, session_id)
+    else:
+        log.info("Часть %s заказа %s оплачена, ждём остальные части группы %s", session_id, op.order_id, op.group)
+
+# Stripe Webhook для подтверждения оплаты с проверкой подписи
+@csrf_exempt
+def stripe_webhook(request):
+    stripe = _stripe()
+    payload = request.body
+    sig_header = request.META.get("HTTP_STRIPE_SIGNATURE", "")
+    secret = settings.STRIPE_WEBHOOK_SECRET
+    if not secret:
+        log.error("STRIPE_WEBHOOK_SECRET не установлен")
+        return HttpResponse(status=500)
+
+    try:
+        event = stripe.Webhook.construct_event(payload=payload, sig_header=sig_header, secret=secret)
+    except Exception:
+        return HttpResponse(status=400)
+
+    if event["type"] == "checkout.session.completed":
+        data = event["data"]["object"]
+        session_id = data.get("id")
+
+        # одиночная покупка Item
+        mark_checkout_session_paid(session_id)
+
+        # оплата заказа
+        _mark_order_paid(session_id)
+
+    # PaymentIntent заказа (части split-оплаты записываются в OrderPayment по id интента)
+    elif event["type"] == "payment_intent.succeeded":
+        _mark_order_paid(event["data"]["object"].get("id"))
+
+    # сессия истекла без оплаты — сразу переносим её в архив, чтобы не раздувать рабочие таблицы
+    # (кроме частей split-оплаты: они остаются в группе, и заказ не закроется без новой оплаты)
+    elif event["type"] == "checkout.session.expired":
+        session_id = event["data"]["object"].get("id")
+        if archive_expired_session(session_id):
+            log.info("Сессия %s истекла и перенесена в архив", session_id)
+
+    return HttpResponse(status=200)
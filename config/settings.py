@@ -30,12 +30,20 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # статика из самого приложения (в т.ч. под gunicorn): хешированные имена, .gz/.br, immutable-кеш
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # быстрый 503 для checkout-эндпоинтов, когда Stripe не успевает (см. ADMISSION_CONTROL)
+    'catalog.middleware.AdmissionControlMiddleware',
+    # сжатие HTML/JSON ответов; строго ниже WhiteNoise: статику WhiteNoise отдаёт раньше (уже сжатые .gz/.br)
+    # и до GZip она не доходит, повторно не сжимается
+    'django.middleware.gzip.GZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'catalog.middleware.RequestProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -71,6 +79,19 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static'] if (BASE_DIR / 'static').exists() else []
 
+# collectstatic кладёт файлы с хешем в имени и заранее сжатые копии (gzip + brotli),
+# WhiteNoise отдаёт их с Cache-Control: max-age=315360000, immutable
+# хешированные имена — только когда манифест уже собран (или STATIC_MANIFEST=1 для самого collectstatic):
+# без staticfiles.json любой {% static %} падал бы с 500 при DEBUG=False
+STATIC_MANIFEST = env.bool('STATIC_MANIFEST', default=(STATIC_ROOT / 'staticfiles.json').exists())
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+        else 'whitenoise.storage.CompressedStaticFilesStorage',
+    },
+}
+
 # локализация
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -124,4 +145,66 @@ def get_stripe_publishable_for(currency: str) -> str:
 
 SUCCESS_URL = env('SUCCESS_URL', default='http://localhost:8000/success/')
 CANCEL_URL = env('CANCEL_URL', default='http://localhost:8000/cancel/')
-STRIPE_WEBHOOK_SECRET = env('STRIPE_WEBHOOK_SECRET', default='')
\ No newline at end of file
+STRIPE_WEBHOOK_SECRET = env('STRIPE_WEBHOOK_SECRET', default='')
+
+# профилирование запросов (cProfile + SQL), профили смотреть в админке: Catalog → Request profiles
+# включается только явно; токен для заголовка X-Profile-Token: catalog.services.profiling.make_profile_token(user) —
+# одноразовый и действует только вместе с сессией этого пользователя
+PROFILING_ENABLED = env.bool('PROFILING_ENABLED', default=False)
+PROFILING_SAMPLE_RATE = env.float('PROFILING_SAMPLE_RATE', default=0.0)
+PROFILING_DIR = Path(env('PROFILING_DIR', default=str(BASE_DIR / 'profiles')))
+PROFILING_TOKEN_MAX_AGE = env.int('PROFILING_TOKEN_MAX_AGE', default=3600)
+
+# размер пула потоков для массовых действий админки со Stripe
+STRIPE_SYNC_CONCURRENCY = env.int('STRIPE_SYNC_CONCURRENCY', default=10)
+# запросов в секунду на один Stripe-аккаунт для массовых операций (test mode ~25, live ~100)
+STRIPE_RATE_LIMIT = env.float('STRIPE_RATE_LIMIT', default=20)
+
+# неоплаченные сессии старше этого срока переносятся в архив командой archive_sessions
+SESSION_ARCHIVE_AFTER_DAYS = env.float('SESSION_ARCHIVE_AFTER_DAYS', default=7)
+
+# заказы со смешанными валютами оплачиваются частями (по одной сессии/интенту на валюту);
+# без флага такие заказы по-прежнему отклоняются, включить для одного запроса можно через ?split=1
+# (только для API: кнопки страниц заказа ходят с ?split=0 — checkout.js ответ из частей не разбирает)
+STRIPE_SPLIT_MIXED_CURRENCY = env.bool('STRIPE_SPLIT_MIXED_CURRENCY', default=False)
+
+# /order-intent/ создаёт PaymentIntent во время рендера и встраивает client_secret в страницу
+# (без второго запроса браузера); для одного запроса включается/выключается ?prefetch=1/0
+STRIPE_INTENT_ON_PAGE = env.bool('STRIPE_INTENT_ON_PAGE', default=False)
+# сколько хранить встроенный интент для повторного показа той же страницы (заказ + валюта + сумма)
+STRIPE_INTENT_CACHE_SECONDS = env.int('STRIPE_INTENT_CACHE_SECONDS', default=3600)
+# сколько /order-intent/ ждёт Stripe; не успел — страница отдаётся без интента, его создаст кнопка
+STRIPE_INTENT_PREFETCH_TIMEOUT = env.float('STRIPE_INTENT_PREFETCH_TIMEOUT', default=1.0)
+
+# налоги (Tax.id), которые корзина в сессии добавляет к заказу
+CART_TAX_IDS = env.list('CART_TAX_IDS', cast=int, default=[])
+
+# срок жизни подписанного расчёта заказа (quote-токен со страницы заказа для buy-эндпоинтов), секунды
+QUOTE_TOKEN_MAX_AGE = env.int('QUOTE_TOKEN_MAX_AGE', default=900)
+
+# admin changelist больших таблиц (CheckoutSession/OrderPayment): до этого числа строк — точный COUNT,
+# дальше — оценка (Postgres: EXPLAIN) или нижняя граница
+ADMIN_EXACT_COUNT_LIMIT = env.int('ADMIN_EXACT_COUNT_LIMIT', default=10000)
+
+# read-only снимок каталога в файле (mmap, общий для всех воркеров), см. build_catalog_snapshot
+# пусто — товары читаются из БД; без файла тоже работает через БД
+CATALOG_SNAPSHOT_PATH = env('CATALOG_SNAPSHOT_PATH', default='') or None
+# пересобирать снимок после сохранения/удаления Item через ORM (в фоне, не в запросе)
+CATALOG_SNAPSHOT_AUTO_REBUILD = env.bool('CATALOG_SNAPSHOT_AUTO_REBUILD', default=True)
+# пауза перед фоновой пересборкой: изменения Item за это время собираются одной сборкой
+CATALOG_SNAPSHOT_REBUILD_DELAY = env.float('CATALOG_SNAPSHOT_REBUILD_DELAY', default=2.0)
+
+# admission control: группы маршрутов с лимитом одновременных запросов (на процесс) и короткой очередью
+# лимит снижается, когда средняя длительность запросов группы выше target_latency (сек)
+ADMISSION_CONTROL = {
+    'checkout': {
+        # эту же группу занимает /order-intent/ на время prefetch интента (сама страница не ограничивается)
+        'paths': ['/buy/', '/buy-order/', '/buy-intent/', '/buy-order-intent/'],
+        'max_concurrency': env.int('CHECKOUT_MAX_CONCURRENCY', default=8),
+        'min_concurrency': 1,
+        'queue_size': env.int('CHECKOUT_QUEUE_SIZE', default=8),
+        'queue_timeout': 0.5,
+        'target_latency': env.float('CHECKOUT_TARGET_LATENCY', default=1.5),
+        'retry_after': 2,
+    },
+}
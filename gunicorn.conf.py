@@ -0,0 +1,16 @@
+import os
+
+# gunicorn читает этот файл сам (gunicorn.conf.py в рабочей директории)
+# gthread: несколько запросов на процесс — только так лимиты AdmissionControlMiddleware (они в пределах процесса)
+# что-то ограничивают; sync-воркер обрабатывает один запрос за раз, и /healthz/ стоял бы в очереди за checkout
+# потоков на воркер должно быть больше CHECKOUT_MAX_CONCURRENCY + CHECKOUT_QUEUE_SIZE, чтобы остальным маршрутам
+# всегда оставались свободные потоки
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "24"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 10
+keepalive = 5
+accesslog = "-"